@@ -1,13 +1,404 @@
 import math
+import os
+import time
+import numpy as np
+from bitboard import PAWN, QUEEN, SIDES
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from piece_square import PIECE_VALUES, PIECE_SQUARE
+from opening_book import OpeningBook
+import tablebase
 
-def min_max(board, depth, game):  # determination algorithm, ai will be the minimizer
-    pass
+# search settings
+TABLE_SIZE_MB = 16      # memory cap for the transposition table
+TIME_LIMIT = 1.0        # seconds the ai can think about one move
+MAX_DEPTH = 64
+SEARCH_WORKERS = 1      # processes used by min_max, more than one uses the parallel search in parallel_search.py
+BOOK_PATH = "book.bin"  # opening book, built with opening_book.py, the ai searches every move when it is missing
+
+MATE_SCORE = 30000
+INFINITY = 32000
+MAX_PLY = 128
+
+# move ordering scores, each stage always sorts ahead of the next one
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 26
+KILLER_SCORES = (1 << 25, (1 << 25) - 1)
+HISTORY_LIMIT = 1 << 24     # history is halved once a score gets this big
+VICTIM_VALUES = [100, 320, 330, 500, 900, 10000]
+
+# a capture is skipped in quiescence when even winning the piece plus this margin cant raise alpha
+DELTA_MARGIN = 200
 
-def eval_board(board):   # point assignment
+
+# raised inside the search when the time or node budget runs out
+class SearchTimeout(Exception):
     pass
 
+
+# alpha-beta negamax with iterative deepening
+# one Search is kept between moves so the transposition table carries over
+# a table can be passed in to share it, for example one in shared memory
+class Search:
+    def __init__(self, table_size_mb = TABLE_SIZE_MB, table = None):
+        self.table = table if table is not None else TranspositionTable(table_size_mb)
+        self.nodes = 0
+        self.completed_depth = 0
+        self.score = 0
+        self.best_move = None
+        self.elapsed = 0.0
+        self.deadline = None
+        self.stop_requested = False     # set from another thread to end the search early
+        self.stop_token = None          # anything with is_set() (like a threading.Event) that ends the search when set
+
+        # move ordering tables, kept for every iteration of a search
+        self.use_ordering = True
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]     # two quiet moves per ply that caused a cutoff
+        self.history = {"White": [0] * 4096, "Black": [0] * 4096}   # cutoffs by quiet moves, by from * 64 + to
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    # search deeper and deeper until max_depth or the budget runs out
+    # returns the best move of the last depth that finished
+    # progress is called with (depth, score, best move, nodes) after every depth that finishes
+    # start_depth lets helpers of a parallel search begin deeper than the main search
+    # stop is a token for this search only, setting it stops it even if that happens before think is called
+    def think(self, board, max_depth, time_limit = None, node_limit = None, progress = None, start_depth = 1, stop = None):
+        self.stop_requested = False     # a stop() meant for an earlier search doesnt end this one
+        self.stop_token = stop
+        self.table.new_search()
+        self.nodes = 0
+        self.completed_depth = 0
+        self.score = 0
+        self.start = time.perf_counter()
+        if time_limit:      # without a time limit a deadline set from another thread (a ponder hit) is kept
+            self.deadline = self.start + time_limit
+        self.node_limit = node_limit
+        root_stack = len(board.undo_stack)
+
+        # killers belong to the last position, history is kept but made to count less than new results
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        for side_history in self.history.values():
+            for i in range(4096):
+                side_history[i] >>= 1
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+
+        moves = find_moves(board, board.turn, None)
+        self.best_move = moves[0] if moves else None    # always have something to play
+        if len(moves) <= 1:
+            self.deadline = None
+            return self.best_move
+
+        for depth in range(start_depth, max_depth + 1):
+            self.root_best = None
+            try:
+                score = self.negamax(board, depth, -INFINITY, INFINITY, 0)
+            except SearchTimeout:
+                # take back the moves that were being searched when time ran out
+                while len(board.undo_stack) > root_stack:
+                    board.unmake_move()
+                break
+
+            self.best_move = self.root_best
+            self.completed_depth = depth
+            self.score = score
+            if progress:
+                progress(depth, score, self.best_move, self.nodes)
+            if abs(score) >= MATE_SCORE - MAX_PLY:     # found a forced mate, searching deeper wont change it
+                break
+
+        self.elapsed = time.perf_counter() - self.start
+        self.deadline = None
+        return self.best_move
+
+    # forget everything learned so far, the table and the move ordering, for example before a new game
+    def clear(self):
+        self.table.clear()
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = {"White": [0] * 4096, "Black": [0] * 4096}
+
+    # ask a running search to stop, it returns the best move found so far
+    def stop(self):
+        self.stop_requested = True
+
+    # stop the search once the clock or the node count is used up
+    def check_budget(self):
+        if self.stop_requested or self.stop_token is not None and self.stop_token.is_set():
+            raise SearchTimeout()
+        if self.node_limit and self.nodes >= self.node_limit:
+            raise SearchTimeout()
+        if self.deadline and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+    # score of the position for the side to move
+    def negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 255 == 0:
+            self.check_budget()
+
+        if ply and board.halfmove_clock >= 100:     # fifty move rule
+            return 0
+
+        # with only a few pieces left the tablebases know the exact result
+        if ply and board.all_occupied.bit_count() <= tablebase.MAX_PIECES:
+            result = tablebase.probe(board)
+            if result:
+                outcome, plies = result
+                if outcome == tablebase.WIN:
+                    return MATE_SCORE - ply - plies
+                if outcome == tablebase.LOSS:
+                    return -MATE_SCORE + ply + plies
+                return 0
+
+        key = board.zobrist_key
+        original_alpha = alpha
+        hash_move = 0
+        entry = self.table.probe(key)
+        if entry:
+            hash_move, score, entry_depth, bound = entry
+            if ply and entry_depth >= depth:
+                score = score_from_table(score, ply)
+                if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                    return score
+
+        if depth <= 0:
+            return self.quiescence(board, alpha, beta, ply)
+
+        moves = find_moves(board, board.turn, None)
+        if not moves:
+            return -MATE_SCORE + ply if board.is_in_check(board.turn) else 0     # checkmate or stalemate
+
+        if self.use_ordering:
+            moves = self.order_moves(board, moves, hash_move, ply)
+        elif hash_move in moves:    # try the best move from an earlier search first
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+
+        best_score = -INFINITY
+        best_move = 0
+        for index, move in enumerate(moves):
+            simulate_move(board, move, None)
+            score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if ply == 0:
+                    self.root_best = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.beta_cutoffs += 1
+                        if index == 0:
+                            self.first_move_cutoffs += 1
+                        if not is_capture(board, move):
+                            self.remember_cutoff(board.turn, move, depth, ply)
+                        break
+
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(key, depth, score_to_table(best_score, ply), bound, best_move)
+        return best_score
+
+    # search only captures and promotions at the leaves so the score isnt taken in the middle of an exchange
+    def quiescence(self, board, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 255 == 0:
+            self.check_budget()
+        if ply >= MAX_PLY - 1:
+            return evaluate(board)
+
+        # in check every evasion has to be looked at and standing pat isnt allowed
+        if board.is_in_check(board.turn):
+            moves = find_moves(board, board.turn, None)
+            if not moves:
+                return -MATE_SCORE + ply
+            stand_pat = -INFINITY
+        else:
+            # standing pat, the side to move can usually do at least as well as the static score
+            stand_pat = evaluate(board)
+            if stand_pat >= beta:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+            moves = find_captures(board)
+
+        best_score = stand_pat
+        for move in self.order_moves(board, moves, 0, ply):
+            promotion = move >> 12
+            if promotion and promotion != QUEEN and stand_pat != -INFINITY:
+                continue    # under promotions almost never matter here
+
+            # delta pruning, skip captures that cant bring the score back up to alpha
+            if stand_pat != -INFINITY and not promotion:
+                victim = board.squares[(move >> 6) & 63]
+                gain = PIECE_VALUES[victim.kind] if victim else PIECE_VALUES[PAWN]
+                if stand_pat + gain + DELTA_MARGIN <= alpha:
+                    continue
+
+            simulate_move(board, move, None)
+            score = -self.quiescence(board, -beta, -alpha, ply + 1)
+            board.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        return best_score
+
+    # hash move, then captures by most valuable victim / least valuable attacker,
+    # then the killer moves of this ply, then quiet moves by their history score
+    def order_moves(self, board, moves, hash_move, ply):
+        killers = self.killers[ply]
+        history = self.history[board.turn]
+        squares = board.squares
+        enemy = board.occupied["Black" if board.turn == "White" else "White"]
+
+        def score(move):
+            if move == hash_move:
+                return HASH_MOVE_SCORE
+            from_sq, to_sq = move & 63, (move >> 6) & 63
+            if enemy >> to_sq & 1:
+                return CAPTURE_SCORE + 10 * VICTIM_VALUES[squares[to_sq].kind] - VICTIM_VALUES[squares[from_sq].kind]
+            if move >> 12:      # promotions rank with the captures, queen first
+                return CAPTURE_SCORE + PIECE_VALUES[move >> 12]
+            if squares[from_sq].kind == PAWN and (from_sq - to_sq) & 7:     # en passant, a pawn takes a pawn
+                return CAPTURE_SCORE + 9 * VICTIM_VALUES[PAWN]
+            if move == killers[0]:
+                return KILLER_SCORES[0]
+            if move == killers[1]:
+                return KILLER_SCORES[1]
+            return history[from_sq * 64 + to_sq]
+
+        moves.sort(key = score, reverse = True)
+        return moves
+
+    # a quiet move caused a beta cutoff, so try it early in sibling nodes and later searches
+    def remember_cutoff(self, side, move, depth, ply):
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        history = self.history[side]
+        index = (move & 63) * 64 + ((move >> 6) & 63)
+        history[index] += depth * depth
+        if history[index] >= HISTORY_LIMIT:
+            for i in range(4096):
+                history[i] >>= 1
+
+    def stats(self):
+        return {
+            "depth": self.completed_depth,
+            "score": self.score,
+            "nodes": self.nodes,
+            "time": round(self.elapsed, 3),
+            "nps": int(self.nodes / self.elapsed) if self.elapsed else 0,
+            "hashfull": self.table.hashfull(),
+            "beta_cutoffs": self.beta_cutoffs,
+            "first_move_cutoff_rate": round(self.first_move_cutoffs / self.beta_cutoffs, 3) if self.beta_cutoffs else 0,
+            "move_ordering": self.use_ordering,
+        }
+
+
+# mate scores are stored relative to the node so they stay correct when found from another ply
+def score_to_table(score, ply):
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+def score_from_table(score, ply):
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+
+_search = None
+_book = None
+
+# move from the opening book for this position, None when out of book or there is no book file
+def book_move(board):
+    global _book
+    if _book is None:
+        _book = OpeningBook(BOOK_PATH) if os.path.exists(BOOK_PATH) else False
+    return _book.choose(board) if _book else None
+
+def min_max(board, depth, game, time_limit = TIME_LIMIT, node_limit = None, workers = None):  # best move for the side to move, from the book or a search
+    move = book_move(board)     # known openings dont need a search
+    if move:
+        return move
+
+    global _search
+    workers = workers or SEARCH_WORKERS
+    if _search is None or getattr(_search, "workers", 1) != workers:
+        if workers > 1:
+            from parallel_search import ParallelSearch
+            _search = ParallelSearch(workers)
+        else:
+            _search = Search()
+    return _search.think(board, depth, time_limit, node_limit)
+
+# evaluation weights, one row of 64 squares for each of the 12 piece planes (white pieces then black)
+# black pieces count against white so one dot product gives the whole score
+EVAL_WEIGHTS = np.array([PIECE_SQUARE["White"][kind] for kind in range(6)] +
+                        [[-value for value in PIECE_SQUARE["Black"][kind]] for kind in range(6)],
+                        dtype = np.int32).reshape(12 * 64)
+
+# the 12 piece bitboards of a board, white pieces then black, in the order of EVAL_WEIGHTS
+def piece_bitboards(board):
+    return [board.pieces[side][kind] for side in SIDES for kind in range(6)]
+
+# turn rows of 12 bitboards into rows of 12 * 64 zeros and ones, square 0 first
+def piece_planes(bitboards):
+    bitboards = np.asarray(bitboards, dtype = "<u8")
+    as_bytes = bitboards.view(np.uint8).reshape(bitboards.shape[:-1] + (12 * 8,))
+    return np.unpackbits(as_bytes, axis = -1, bitorder = "little")
+
+def eval_board(board):   # point assignment, positive is good for white
+    return int(piece_planes(piece_bitboards(board)) @ EVAL_WEIGHTS)
+
+# leaf evaluation for the side to move, read off the running totals the board keeps up to date
+# gives the same score as eval_board without looking at the pieces
+def evaluate(board):
+    white = board.material["White"] + board.positional["White"]
+    black = board.material["Black"] + board.positional["Black"]
+    return white - black if board.turn == "White" else black - white
+
+# score many positions in one go, positions can be boards or rows of 12 bitboards from piece_bitboards
+# returns a numpy array of scores, positive is good for white
+def eval_batch(positions):
+    rows = [piece_bitboards(position) if hasattr(position, "pieces") else position for position in positions]
+    if not rows:
+        return np.zeros(0, dtype = np.int64)
+    return piece_planes(rows).astype(np.int32) @ EVAL_WEIGHTS
+
+# does a move take a piece, including en passant
+def is_capture(board, move):
+    to_sq = (move >> 6) & 63
+    if board.all_occupied >> to_sq & 1:
+        return True
+    return board.squares[move & 63].kind == PAWN and ((move & 63) - to_sq) & 7 != 0
+
+def find_captures(board):   # captures and promotions for the side to move, used by quiescence
+    return list(board.legal_moves(captures_only = True))
+
 def find_moves(board, side, game):   # store all valid moves
-    pass
+    if side == board.turn:
+        return list(board.legal_moves())
+    return list(board.legal_moves(side))
 
 def simulate_move(board, move, game):   # give the ai a simulation of the board after each valid move
-    pass
+    board.make_move(move)       # taken back with board.unmake_move()
+    return board
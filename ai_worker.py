@@ -0,0 +1,149 @@
+import threading
+import time
+from ai_algorithm import Search, MAX_DEPTH, TIME_LIMIT, SEARCH_WORKERS, book_move
+
+PONDER_TIME_FACTOR = 5      # pondering stops after this many times the time limit, then the cpu is left alone
+
+# a search on several processes when SEARCH_WORKERS asks for more than one
+def new_search():
+    if SEARCH_WORKERS > 1:
+        from parallel_search import ParallelSearch
+        return ParallelSearch(SEARCH_WORKERS)
+    return Search()
+
+
+# runs the ai search on a background thread so the window keeps handling events while it thinks
+#
+# the search works on a copy of the board and reports back through notify(message), called from the
+# worker thread with a dict:
+#   {"kind": "progress", "job", "ponder", "depth", "score", "move", "nodes"} after every finished depth
+#   {"kind": "done", "job", "move"} when the move for the side to move is ready
+# messages from a job that has since been cancelled or replaced have an old job number and should be ignored,
+# a done message that is used has to be handed back with accept(job) so the ai can be asked for the next move
+#
+# after the ai moves it can ponder: search the position after the reply it expects while the player thinks,
+# for up to PONDER_TIME_FACTOR times the time limit. if the player plays that reply the running search just gets
+# a deadline (a ponder hit), otherwise it is thrown away and a new search starts, the table still has what it found
+class AIWorker:
+    def __init__(self, time_limit = TIME_LIMIT, notify = None):
+        self.time_limit = time_limit
+        self.notify = notify
+        self.search = new_search()  # kept between moves so the transposition table carries over
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = None      # stop token of the running job
+        self.job = 0
+        self.mode = None            # None, "think" or "ponder"
+        self.pending_job = None     # job asked for a move whose done message the caller hasnt accepted yet
+        self.ponder_key = None      # zobrist key of the position being pondered
+        self.ponder_result = None   # move found by a ponder search that finished before the player moved
+        self.expected_reply = None  # move the ai thinks the player will answer with
+
+    # true from start() until accept() takes the move, including while the done message is still on its way
+    @property
+    def thinking(self):
+        return self.pending_job is not None
+
+    # the caller has taken the move from a done message, returns False when it is from an old job
+    def accept(self, job):
+        with self.lock:
+            if job != self.pending_job:
+                return False
+            self.pending_job = None
+            return True
+
+    # start looking for a move for the side to move on board
+    def start(self, board):
+        with self.lock:
+            if self.mode == "ponder" and board.zobrist_key == self.ponder_key:
+                # ponder hit, the search already running is on this position
+                self.pending_job = self.job
+                if self.ponder_result is not None:
+                    self.mode = None
+                    self.send({"kind": "done", "job": self.job, "move": self.ponder_result})
+                else:
+                    self.mode = "think"
+                    self.search.deadline = time.perf_counter() + self.time_limit
+                return
+        self.cancel()
+
+        move = book_move(board)     # known openings are played straight away
+        if move:
+            self.job += 1
+            self.pending_job = self.job
+            self.expected_reply = None
+            self.send({"kind": "done", "job": self.job, "move": move})
+            return
+        self.launch(board.copy(), "think")
+
+    # think on the opponents time about the reply the last search expected, returns False if there is none
+    def ponder(self, board):
+        self.cancel()
+        snapshot = board.copy()
+        if not self.expected_reply or self.expected_reply not in list(snapshot.legal_moves()):
+            return False
+        snapshot.make_move(self.expected_reply)
+        if not list(snapshot.legal_moves()):    # the reply ends the game, nothing to think about
+            return False
+        self.ponder_key = snapshot.zobrist_key
+        self.launch(snapshot, "ponder")
+        return True
+
+    # stop whatever is running, used for a new game, going back to the menu or quitting
+    def cancel(self):
+        with self.lock:
+            self.job += 1
+            self.mode = None
+            self.pending_job = None
+            self.ponder_key = None
+            self.ponder_result = None
+        if self.stop_event:
+            self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def launch(self, snapshot, mode):
+        with self.lock:
+            self.job += 1
+            self.mode = mode
+            if mode == "think":
+                self.pending_job = self.job
+            self.ponder_result = None
+        # the ponder deadline is set here rather than in think so a ponder hit can move it at any time
+        self.search.deadline = time.perf_counter() + self.time_limit * PONDER_TIME_FACTOR if mode == "ponder" else None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target = self.run, args = (snapshot, self.job, mode, self.stop_event), daemon = True)
+        self.thread.start()
+
+    def run(self, snapshot, job, mode, stop):
+        def progress(depth, score, move, nodes):
+            self.send({"kind": "progress", "job": job, "ponder": self.mode == "ponder",
+                       "depth": depth, "score": score, "move": move, "nodes": nodes})
+
+        time_limit = self.time_limit if mode == "think" else None
+        move = self.search.think(snapshot, MAX_DEPTH, time_limit, progress = progress, stop = stop)
+
+        with self.lock:
+            if job != self.job:     # cancelled while searching
+                return
+            self.expected_reply = self.find_reply(snapshot, move)
+            if self.mode == "think":
+                self.mode = None
+                self.send({"kind": "done", "job": job, "move": move})
+            else:
+                self.ponder_result = move   # wait for the player to move
+
+    # the move the table has for the position after move, that is the reply the search expects
+    def find_reply(self, board, move):
+        if not move:
+            return None
+        board.make_move(move)
+        entry = self.search.table.probe(board.zobrist_key)
+        reply = entry[0] if entry and entry[0] in list(board.legal_moves()) else None
+        board.unmake_move()
+        return reply
+
+    def send(self, message):
+        if self.notify:
+            self.notify(message)
@@ -0,0 +1,162 @@
+# bitboard helpers shared by the board and the pieces
+# squares are numbered row * 8 + col using the same rows as the screen, so square 0 is the
+# top left corner (A8) and square 63 is the bottom right corner (H1)
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+SIDES = ("White", "Black")
+
+EMPTY = 0
+FULL = 0xFFFF_FFFF_FFFF_FFFF
+LAST_ROWS = 0xFF | (0xFF << 56)     # the top and bottom rows, where pawns promote
+LIGHT_SQUARES = sum(1 << sq for sq in range(64) if (sq >> 3) % 2 == (sq & 7) % 2)    # A8 and H1 are light
+
+
+def square(row, col):
+    return row * 8 + col
+
+def row_col(sq):
+    return sq >> 3, sq & 7
+
+def bit(row, col):
+    return 1 << (row * 8 + col)
+
+def other_side(side):
+    return "Black" if side == "White" else "White"
+
+# index of the lowest set bit
+def lsb(bb):
+    return (bb & -bb).bit_length() - 1
+
+def popcount(bb):
+    return bb.bit_count()
+
+# go through the squares of a bitboard from lowest to highest
+def iter_squares(bb):
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+# precomputed attack tables, built once when the module is imported
+def _offset_table(offsets):
+    table = []
+    for sq in range(64):
+        row, col = row_col(sq)
+        attacks = EMPTY
+        for dy, dx in offsets:
+            r, c = row + dy, col + dx
+            if 0 <= r < 8 and 0 <= c < 8:
+                attacks |= bit(r, c)
+        table.append(attacks)
+    return table
+
+KNIGHT_ATTACKS = _offset_table([(2,1), (1,2), (-2,1), (-1,2), (2,-1), (1, -2), (-2,-1), (-1,-2)])
+KING_ATTACKS = _offset_table([(-1,0), (1,0), (0,1), (0,-1), (-1,1), (-1,-1), (1,1), (1,-1)])
+PAWN_ATTACKS = {"White": _offset_table([(-1,-1), (-1,1)]),     # white pawns move up the screen
+                "Black": _offset_table([(1,-1), (1,1)])}
+
+# sliding directions as (row step, col step)
+ROOK_DIRECTIONS = [(-1,0), (1,0), (0,1), (0,-1)]
+BISHOP_DIRECTIONS = [(-1,1), (-1,-1), (1,1), (1,-1)]
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+# RAYS[direction][sq] holds every tile from sq to the edge of the board in that direction
+RAYS = {}
+for _direction in QUEEN_DIRECTIONS:
+    RAYS[_direction] = []
+    for _sq in range(64):
+        _row, _col = row_col(_sq)
+        _ray = EMPTY
+        while True:
+            _row += _direction[0]
+            _col += _direction[1]
+            if not (0 <= _row < 8 and 0 <= _col < 8):
+                break
+            _ray |= bit(_row, _col)
+        RAYS[_direction].append(_ray)
+
+# directions that walk towards higher square numbers find their first blocker with the lowest bit
+def _is_forward(direction):
+    return direction[0] * 8 + direction[1] > 0
+
+FORWARD = {direction: _is_forward(direction) for direction in QUEEN_DIRECTIONS}
+
+# every tile a slider on sq can reach, walking each ray once and stopping at the first blocker
+def slider_attacks(sq, occupied, directions):
+    attacks = EMPTY
+    for direction in directions:
+        ray = RAYS[direction][sq]
+        blockers = ray & occupied
+        if blockers:
+            if FORWARD[direction]:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= RAYS[direction][first]     # cut the ray off behind the blocker
+        attacks |= ray
+    return attacks
+
+# BETWEEN[a][b] holds the tiles strictly between two squares on the same row, column or diagonal
+BETWEEN = [[EMPTY] * 64 for _ in range(64)]
+for _sq in range(64):
+    for _direction in QUEEN_DIRECTIONS:
+        _row, _col = row_col(_sq)
+        _between = EMPTY
+        while True:
+            _row += _direction[0]
+            _col += _direction[1]
+            if not (0 <= _row < 8 and 0 <= _col < 8):
+                break
+            BETWEEN[_sq][square(_row, _col)] = _between
+            _between |= bit(_row, _col)
+
+
+# castling rights are kept as four bits
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+ALL_CASTLING = 15
+
+# the rights left after a piece moves from or to each square, only the king and rook homes take any away
+CASTLING_KEEP = [ALL_CASTLING] * 64
+CASTLING_KEEP[square(7, 4)] &= ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_KEEP[square(7, 7)] &= ~WHITE_KINGSIDE
+CASTLING_KEEP[square(7, 0)] &= ~WHITE_QUEENSIDE
+CASTLING_KEEP[square(0, 4)] &= ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_KEEP[square(0, 7)] &= ~BLACK_KINGSIDE
+CASTLING_KEEP[square(0, 0)] &= ~BLACK_QUEENSIDE
+
+# right needed, tiles that must be empty and the tile the king lands on for each castle
+CASTLING_MOVES = {
+    "White": [(WHITE_KINGSIDE, bit(7, 5) | bit(7, 6), square(7, 6)),
+              (WHITE_QUEENSIDE, bit(7, 1) | bit(7, 2) | bit(7, 3), square(7, 2))],
+    "Black": [(BLACK_KINGSIDE, bit(0, 5) | bit(0, 6), square(0, 6)),
+              (BLACK_QUEENSIDE, bit(0, 1) | bit(0, 2) | bit(0, 3), square(0, 2))],
+}
+
+
+# moves are packed into one int: from square, to square and the kind a pawn promotes to (0 for none)
+def encode_move(from_sq, to_sq, promotion = 0):
+    return from_sq | (to_sq << 6) | (promotion << 12)
+
+def move_from(move):
+    return move & 63
+
+def move_to(move):
+    return (move >> 6) & 63
+
+def move_promotion(move):
+    return move >> 12
+
+# names in the usual chess notation, row 0 is the 8th rank
+FILES = "abcdefgh"
+PROMOTION_LETTERS = ["", "n", "b", "r", "q"]
+
+def square_name(sq):
+    return FILES[sq & 7] + str(8 - (sq >> 3))
+
+def parse_square(name):
+    return square(8 - int(name[1]), FILES.index(name[0]))
+
+# long algebraic name of a move, like e2e4 or a7a8q
+def move_name(move):
+    return square_name(move_from(move)) + square_name(move_to(move)) + PROMOTION_LETTERS[move_promotion(move)]
@@ -1,326 +1,513 @@
-import pygame
+import copy
+from bitboard import (BISHOP, ROOK, QUEEN, SIDES, EMPTY, square, bit, other_side, iter_squares,
+                      KNIGHT, KING, PAWN, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, ROOK_DIRECTIONS,
+                      BISHOP_DIRECTIONS, BETWEEN, LAST_ROWS, ALL_CASTLING, CASTLING_KEEP, slider_attacks, lsb, row_col,
+                      encode_move, move_from, move_to, move_promotion, LIGHT_SQUARES)
 from pieces import Pawn, Rook, Knight, Bishop, Queen, King
+from position import Position, PIECE_LETTERS
 
-class Board:
-    def __init__(self, size = 60, margin = 60, border = 5):
-
-        # board visuals
-        pygame.font.init()
-        self.size = size
-        self.margin = margin
-        self.border = border
-        self.border_color = (0, 0, 0)
-        self.colors = [(4, 62, 133), (138 , 96, 96)] 
-        self.font = pygame.font.Font(None, 24)
-
-        # board positions setup
-        self.board_positions = [[None for _ in range(8)] for _ in range(8)]
-        for row in range(8):
-            for col in range(8):
-                self.board_positions[row][col] = {
-                    "position": f"{row},{col}",     # wow a dict in a list this couldnt possibly lead to 3 hours of debugging because i cant spell
-                    "occupied": False,
-                    "piece": None
-                }
-
-        # place the pieces for a standard game of chess
-        self.place_pieces()
-
-        # setup for movement
-        self.selected_piece = None
-        self.valid_moves = []
-        self.dragging = False
-        self.drag_offset_x = 0
-        self.drag_offset_y = 0
-
-    # draw the board
-    def draw(self, screen):
-        offset = self.margin
-        border_offset = self.margin - self.border
-        board_size = self.size * 8
-
-        # draw the outside border
-        pygame.draw.rect(screen, self.border_color, 
-                         (border_offset, border_offset,
-                          board_size + 2 * self.border, board_size + 2 * self.border),
-                          self.border)
-
-        # draw the board tiles
-        for row_unflipped in range(8):
-            row = 7 - row_unflipped # reverse direction of row
-            for col in range(8):
-                # draw the board
-                color = self.colors[(row + col) % 2]
-                rect = pygame.Rect((offset + (col * self.size), offset + (row * self.size), self.size, self.size))
-                pygame.draw.rect(screen, color, rect)
-
-                if self.selected_piece and (row, col) in self.valid_moves:  # add a green border to tiles that are within valid moves
-                    pygame.draw.rect(screen, (0, 255, 0), rect, 4)
-
-                # draw the pieces
-                space = self.board_positions[row][col]
-                if space["occupied"]:
-                    piece = space["piece"]
-
-                    # draw the pieces while not dragging
-                    if piece != self.selected_piece or not self.dragging:   # draw the piece images
-                        image_surface = piece.image  
-
-                        xcenter = 60 + col * self.size + (self.size - image_surface.get_width()) // 2
-                        ycenter = 60 + row * self.size + (self.size - image_surface.get_height()) // 2
-
-                        screen.blit(image_surface, (xcenter, ycenter))
-                
-                # draw the images where your cursor is while dragging
-                if self.dragging and self.selected_piece:
-                    image_surface = self.selected_piece.image
-                    xcenter = self.drag_offset_x - image_surface.get_width() // 2
-                    ycenter = self.drag_offset_y - image_surface.get_height() // 2
-                    screen.blit(image_surface, (xcenter, ycenter))
-
-        # label the rows
-        for row in range(8):
-            label = self.font.render(str(8 - row), True, (0, 0, 0))
-            screen.blit(label, (self.margin // 2, 10 + row * self.size + offset + self.size // 4)) # +10 to align to the center of the square
-
-        # label the columns
-        columns = "ABCDEFGH"
-        for col in range(8):
-            label = self.font.render(columns[col], True, (0, 0, 0))
-            screen.blit(label, (10 + col * self.size + offset + self.size // 4, self.margin // 2)) # +10 to align to the center of the square
+from zobrist import PIECE_KEYS, SIDE_KEY, EN_PASSANT_KEYS, CASTLING_KEYS
+from piece_square import PIECE_VALUES, SQUARE_BONUS
 
+PROMOTION_PIECES = {KNIGHT: Knight, BISHOP: Bishop, ROOK: Rook, QUEEN: Queen}
 
-    def place_pieces(self):
-        # white pawns
-        for col in range(8):
-            row = 6
-            piece = Pawn("White", row, col, self)
-            self.board_positions[row][col]["occupied"] = True
-            self.board_positions[row][col]["piece"] = piece
-
-        # black pawns
-        for col in range(8):
-            row = 1
-            piece = Pawn("Black", row, col, self)
-            self.board_positions[row][col]["occupied"] = True
-            self.board_positions[row][col]["piece"] = piece
+# piece class for each kind, in the order of the kinds in bitboard.py
+PIECE_CLASSES = [Pawn, Knight, Bishop, Rook, Queen, King]
 
-        # rooks
-        self.board_positions[7][0]["occupied"] = True
-        self.board_positions[7][0]["piece"] = Rook("White", 7, 0, self)
+DEBUG_EVAL = False      # recompute the running evaluation totals after every move and compare, slow
 
-        self.board_positions[7][7]["occupied"] = True
-        self.board_positions[7][7]["piece"] = Rook("White", 7, 7, self)
+# the rules side of the board, drawing and the mouse are handled by BoardView in board_view.py
+class Board:
+    def __init__(self):
 
-        self.board_positions[0][0]["occupied"] = True
-        self.board_positions[0][0]["piece"] = Rook("Black", 0, 0, self)
+        # board state is kept as bitboards, one 64 bit integer per piece kind and side
+        # bit (row * 8 + col) is set when that kind of piece sits on that tile
+        self.pieces = {"White": [EMPTY] * 6, "Black": [EMPTY] * 6}
+        self.occupied = {"White": EMPTY, "Black": EMPTY}     # every piece of one side
+        self.all_occupied = EMPTY                           # every piece on the board
 
-        self.board_positions[0][7]["occupied"] = True
-        self.board_positions[0][7]["piece"] = Rook("Black", 0, 7, self)
-        
-        # knights
-        self.board_positions[7][1]["occupied"] = True
-        self.board_positions[7][1]["piece"] = Knight("White", 7, 1, self)
+        # piece objects by square, only used to get back to the piece that owns a bit (drawing, move counts)
+        self.squares = [None] * 64
 
-        self.board_positions[7][6]["occupied"] = True
-        self.board_positions[7][6]["piece"] = Knight("White", 7, 6, self)
+        # attack maps, kept up to date on every change to the board
+        self.attack_from = [EMPTY] * 64                         # tiles attacked by the piece on each square
+        self.side_attacks = {"White": EMPTY, "Black": EMPTY}    # every tile attacked by one side, see attacked
+        self.stale_sides = set()                                # sides whose side_attacks need adding up again
 
-        self.board_positions[0][1]["occupied"] = True
-        self.board_positions[0][1]["piece"] = Knight("Black", 0, 1, self)
+        # game state that isnt on the tiles
+        self.turn = "White"                 # white always goes first
+        self.castling_rights = ALL_CASTLING
+        self.en_passant_target = None       # (row, col) a pawn can capture onto for one move
+        self.halfmove_clock = 0             # moves since the last capture or pawn move
+        self.fullmove_number = 1
 
-        self.board_positions[0][6]["occupied"] = True
-        self.board_positions[0][6]["piece"] = Knight("Black", 0, 6, self)
+        # one record per made move so it can be taken back exactly
+        self.undo_stack = []
 
-        # bishops
-        self.board_positions[7][2]["occupied"] = True
-        self.board_positions[7][2]["piece"] = Bishop("White", 7, 2, self)
+        # zobrist hash of the position, updated with an xor on every change
+        self.zobrist_key = CASTLING_KEYS[self.castling_rights]
 
-        self.board_positions[7][5]["occupied"] = True
-        self.board_positions[7][5]["piece"] = Bishop("White", 7, 5, self)
+        # running evaluation totals for each side, updated with the change of every move
+        self.material = {"White": 0, "Black": 0}        # piece values
+        self.positional = {"White": 0, "Black": 0}      # piece-square table bonuses
+        self.debug_eval = DEBUG_EVAL
 
-        self.board_positions[0][2]["occupied"] = True
-        self.board_positions[0][2]["piece"] = Bishop("Black", 0, 2, self)
+        # place the pieces for a standard game of chess
+        self.place_pieces()
 
-        self.board_positions[0][5]["occupied"] = True
-        self.board_positions[0][5]["piece"] = Bishop("Black", 0, 5, self)
+    def place_pieces(self):
+        back_row = [Rook, Knight, Bishop, Queen, King, Bishop, Knight, Rook]
 
-        # queens
-        self.board_positions[7][3]["occupied"] = True
-        self.board_positions[7][3]["piece"] = Queen("White", 7, 3, self)
+        for col in range(8):
+            self.add_piece(Pawn("White", 6, col, self))     # pawns
+            self.add_piece(Pawn("Black", 1, col, self))
 
-        self.board_positions[0][3]["occupied"] = True
-        self.board_positions[0][3]["piece"] = Queen("Black", 0, 3, self)
+            self.add_piece(back_row[col]("White", 7, col, self))    # everything else
+            self.add_piece(back_row[col]("Black", 0, col, self))
 
-        # kings
         # kings are assigned variables to keep track of for check validation
-        self.white_king = King("White", 7, 4, self)     
-        self.board_positions[7][4]["occupied"] = True
-        self.board_positions[7][4]["piece"] = self.white_king
-        
-        self.black_king = King("Black", 0, 4, self)
-        self.board_positions[0][4]["occupied"] = True
-        self.board_positions[0][4]["piece"] = self.black_king
+        self.white_king = self.squares[square(7, 4)]
+        self.black_king = self.squares[square(0, 4)]
+
+    # set the board up from a FEN string instead of the starting position, takes back nothing afterwards
+    def set_fen(self, fen):
+        self.set_position(Position.from_fen(fen))
+
+    # the position as a FEN string
+    def fen(self):
+        return self.to_position().fen()
+
+    # a small unchangeable snapshot of the position (position.py), without the pieces or move history
+    def to_position(self):
+        letters = bytearray(b"." * 64)
+        for piece in self.squares:
+            if piece:
+                letter = PIECE_LETTERS[piece.kind]
+                letters[square(piece.row, piece.column)] = ord(letter.upper() if piece.side == "White" else letter)
+        return Position(letters, self.turn, self.castling_rights,
+                        None if self.en_passant_target is None else square(*self.en_passant_target),
+                        self.halfmove_clock, self.fullmove_number)
+
+    @classmethod
+    def from_position(cls, position):
+        board = cls()
+        board.set_position(position)
+        return board
+
+    # set the board up from a Position, takes back nothing afterwards
+    def set_position(self, position):
+        for piece in self.squares:
+            if piece:
+                self.remove_piece(piece)
+        self.white_king = self.black_king = None
+
+        for sq in range(64):
+            found = position.piece_at(sq)
+            if not found:
+                continue
+            side, kind = found
+            row, col = row_col(sq)
+            piece = PIECE_CLASSES[kind](side, row, col, self)
+            self.add_piece(piece)
+            if kind == KING:
+                if side == "White":
+                    self.white_king = piece
+                else:
+                    self.black_king = piece
+
+        self.turn = position.turn
+        self.castling_rights = position.castling_rights
+        self.en_passant_target = None if position.en_passant is None else row_col(position.en_passant)
+        self.halfmove_clock = position.halfmove_clock
+        self.fullmove_number = position.fullmove_number
+        self.undo_stack = []
+        self.zobrist_key = self.compute_zobrist()
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+    # put a piece on the board at its own row and column
+    def add_piece(self, piece):
+        sq_bit = bit(piece.row, piece.column)
+        self.pieces[piece.side][piece.kind] |= sq_bit
+        self.occupied[piece.side] |= sq_bit
+        self.all_occupied |= sq_bit
+        self.squares[square(piece.row, piece.column)] = piece
+        self.zobrist_key ^= PIECE_KEYS[piece.side][piece.kind][square(piece.row, piece.column)]
+        self.material[piece.side] += PIECE_VALUES[piece.kind]
+        self.positional[piece.side] += SQUARE_BONUS[piece.side][piece.kind][square(piece.row, piece.column)]
+        self.update_attacks(sq_bit, piece.side)
+
+    # take a piece off the board
+    def remove_piece(self, piece):
+        sq_bit = bit(piece.row, piece.column)
+        self.pieces[piece.side][piece.kind] &= ~sq_bit
+        self.occupied[piece.side] &= ~sq_bit
+        self.all_occupied &= ~sq_bit
+        self.squares[square(piece.row, piece.column)] = None
+        self.zobrist_key ^= PIECE_KEYS[piece.side][piece.kind][square(piece.row, piece.column)]
+        self.material[piece.side] -= PIECE_VALUES[piece.kind]
+        self.positional[piece.side] -= SQUARE_BONUS[piece.side][piece.kind][square(piece.row, piece.column)]
+        self.update_attacks(sq_bit, piece.side)
+
+    # move a piece to an empty tile
+    def relocate_piece(self, piece, new_row, new_col):
+        move_bits = bit(piece.row, piece.column) | bit(new_row, new_col)
+        self.pieces[piece.side][piece.kind] ^= move_bits
+        self.occupied[piece.side] ^= move_bits
+        self.all_occupied ^= move_bits
+        self.squares[square(piece.row, piece.column)] = None
+        self.squares[square(new_row, new_col)] = piece
+        keys = PIECE_KEYS[piece.side][piece.kind]
+        self.zobrist_key ^= keys[square(piece.row, piece.column)] ^ keys[square(new_row, new_col)]
+        bonus = SQUARE_BONUS[piece.side][piece.kind]
+        self.positional[piece.side] += bonus[square(new_row, new_col)] - bonus[square(piece.row, piece.column)]
+        piece.row, piece.column = new_row, new_col
+        self.update_attacks(move_bits, piece.side)
+
+    # recompute the attack maps after the tiles in changed were emptied or filled by a piece of side
+    # only the pieces on those tiles and the sliders whose rays were opened or closed by them can change,
+    # the attacks of a whole side are only added up again when they are next asked for (attacked)
+    def update_attacks(self, changed, side):
+        attack_from = self.attack_from
+        stale = self.stale_sides
+        stale.add(side)
+
+        for slider_side in SIDES:
+            pieces = self.pieces[slider_side]
+            for sq in iter_squares((pieces[BISHOP] | pieces[ROOK] | pieces[QUEEN]) & ~changed):
+                if attack_from[sq] & changed:       # the ray reached a changed tile so it may be longer or shorter now
+                    attacks = self.squares[sq].attacks(self)
+                    if attacks != attack_from[sq]:
+                        attack_from[sq] = attacks
+                        stale.add(slider_side)
+
+        for sq in iter_squares(changed):
+            piece = self.squares[sq]
+            attack_from[sq] = piece.attacks(self) if piece else EMPTY
+
+    # every tile attacked by each side, by side, added up from attack_from for the sides that changed
+    # since the last time, so it is done at most once per move however many pieces moved
+    @property
+    def attacked(self):
+        if self.stale_sides:
+            attack_from = self.attack_from
+            for side in self.stale_sides:
+                attacked = EMPTY
+                for sq in iter_squares(self.occupied[side]):
+                    attacked |= attack_from[sq]
+                self.side_attacks[side] = attacked
+            self.stale_sides.clear()
+        return self.side_attacks
+
+    # bitboard of the pieces of side that attack a tile, found by looking outwards from the tile
+    # occupied can be given to ask about a board where some pieces have been lifted off
+    def attackers_to(self, sq, side, occupied = None):
+        if occupied is None:
+            occupied = self.all_occupied
+        pieces = self.pieces[side]
+        attackers = KNIGHT_ATTACKS[sq] & pieces[KNIGHT]
+        attackers |= KING_ATTACKS[sq] & pieces[KING]
+        attackers |= PAWN_ATTACKS[other_side(side)][sq] & pieces[PAWN]     # a pawn attacks sq if sq would attack it back
+        attackers |= slider_attacks(sq, occupied, ROOK_DIRECTIONS) & (pieces[ROOK] | pieces[QUEEN])
+        attackers |= slider_attacks(sq, occupied, BISHOP_DIRECTIONS) & (pieces[BISHOP] | pieces[QUEEN])
+        return attackers & occupied
+
+    # is the tile at row, col attacked by any piece of side
+    def is_square_attacked(self, row, col, side):
+        return bool(self.attackers_to(square(row, col), side))
+
+    # checkers and pinned pieces for side, worked out once per position
+    # pinned maps the square of each pinned piece to the ray it can still move along
+    def check_info(self, side):
+        enemy = other_side(side)
+        king_sq = lsb(self.pieces[side][KING])
+        checkers = self.attackers_to(king_sq, enemy)
+
+        # enemy sliders that would hit the king on an empty board
+        enemy_pieces = self.pieces[enemy]
+        snipers = slider_attacks(king_sq, EMPTY, ROOK_DIRECTIONS) & (enemy_pieces[ROOK] | enemy_pieces[QUEEN])
+        snipers |= slider_attacks(king_sq, EMPTY, BISHOP_DIRECTIONS) & (enemy_pieces[BISHOP] | enemy_pieces[QUEEN])
+
+        pinned = {}
+        for sniper in iter_squares(snipers):
+            blockers = BETWEEN[king_sq][sniper] & self.all_occupied
+            if blockers & self.occupied[side] and not blockers & (blockers - 1):    # exactly one piece in the way and its ours
+                pinned[lsb(blockers)] = BETWEEN[king_sq][sniper] | (1 << sniper)
+
+        return king_sq, checkers, pinned
+
+    # bitboard of the tiles a piece can legally move to, filtered with the checkers and pins of its side
+    def legal_mask(self, piece, en_passant_target = None, check_info = None):
+        if check_info is None:
+            check_info = self.check_info(piece.side)
+        king_sq, checkers, pinned = check_info
+        enemy = other_side(piece.side)
+        sq = square(piece.row, piece.column)
+
+        if piece.kind == KING:
+            mask = piece.move_mask(self)
+            castling = mask & ~KING_ATTACKS[sq]
+            mask &= KING_ATTACKS[sq]
+
+            if not checkers:
+                mask &= ~self.attacked[enemy]
+            else:
+                # look through the king so it cant step back along the ray of a checking slider
+                lifted = self.all_occupied ^ (1 << sq)
+                for target in iter_squares(mask):
+                    if self.attackers_to(target, enemy, lifted):
+                        mask ^= 1 << target
+
+                castling = EMPTY    # cant castle out of check
+
+            # the king cant pass through or land on an attacked tile when castling
+            for target in iter_squares(castling):
+                if not self.attacked[enemy] & (BETWEEN[sq][target] | (1 << target)):
+                    mask |= 1 << target
+
+            return mask
+
+        if checkers & (checkers - 1):     # double check, only the king can move
+            return EMPTY
+
+        mask = piece.move_mask(self, en_passant_target)
+
+        en_passant = EMPTY
+        if piece.kind == PAWN and en_passant_target:
+            en_passant = mask & bit(*en_passant_target)
+            mask &= ~en_passant
+
+        if checkers:
+            mask &= checkers | BETWEEN[king_sq][lsb(checkers)]    # capture the checker or block it
+        if sq in pinned:
+            mask &= pinned[sq]      # pinned pieces can only slide along the pin
+
+        # en passant removes two pieces from one row, so just look for attacks on the king after it
+        if en_passant:
+            to_sq = lsb(en_passant)
+            captured = 1 << (to_sq + 8 if piece.side == "White" else to_sq - 8)
+            after = self.all_occupied ^ (1 << sq) ^ en_passant ^ captured
+            if not self.attackers_to(king_sq, enemy, after):
+                mask |= en_passant
+
+        return mask
+
+    # every legal move for side as packed moves, pawns reaching the last row yield one move per promotion
+    # with captures_only only captures (en passant included) and promotions are generated
+    def legal_moves(self, side = None, en_passant_target = None, captures_only = False):
+        if side is None:    # default to the side to move in the current position
+            side, en_passant_target = self.turn, self.en_passant_target
+        info = self.check_info(side)
+        enemy = self.occupied[other_side(side)]
+        pawn_targets = enemy | LAST_ROWS
+        if en_passant_target:
+            pawn_targets |= bit(*en_passant_target)
+
+        for from_sq in iter_squares(self.occupied[side]):
+            piece = self.squares[from_sq]
+            mask = self.legal_mask(piece, en_passant_target, info)
+            if captures_only:
+                mask &= pawn_targets if piece.kind == PAWN else enemy
+            for to_sq in iter_squares(mask):
+                if piece.kind == PAWN and (to_sq < 8 or to_sq >= 56):
+                    for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        yield encode_move(from_sq, to_sq, promotion)
+                else:
+                    yield encode_move(from_sq, to_sq)
+
+    # play a packed move for the side to move, it must be legal
+    def make_move(self, move):
+        from_sq, to_sq, promotion = move_from(move), move_to(move), move_promotion(move)
+        piece = self.squares[from_sq]
+        captured = self.squares[to_sq]
+        to_row, to_col = row_col(to_sq)
+
+        # en passant takes the pawn behind the target tile
+        if piece.kind == PAWN and not captured and self.en_passant_target == (to_row, to_col):
+            captured = self.squares[to_sq + 8 if piece.side == "White" else to_sq - 8]
+
+        self.undo_stack.append((move, piece, captured, self.castling_rights, self.en_passant_target, self.halfmove_clock,
+                                self.zobrist_key))
+
+        # the old en passant target only lasts for this move
+        self.zobrist_key ^= self.en_passant_key()
+        self.en_passant_target = None
+
+        if captured:
+            self.remove_piece(captured)
+
+        if promotion:
+            self.remove_piece(piece)
+            self.add_piece(PROMOTION_PIECES[promotion](piece.side, to_row, to_col, self))
+        else:
+            self.relocate_piece(piece, to_row, to_col)
+
+        # castling also moves the rook to the other side of the king
+        if piece.kind == KING and abs(to_sq - from_sq) == 2:
+            rook = self.piece_at(to_row, 7 if to_sq > from_sq else 0)
+            self.relocate_piece(rook, to_row, (from_sq + to_sq) // 2 & 7)
+            rook.move_count += 1
+
+        # a king or rook leaving its starting tile, or a rook being captured on it, loses those rights
+        self.zobrist_key ^= CASTLING_KEYS[self.castling_rights]
+        self.castling_rights &= CASTLING_KEEP[from_sq] & CASTLING_KEEP[to_sq]
+        self.zobrist_key ^= CASTLING_KEYS[self.castling_rights]
+
+        if piece.kind == PAWN or captured:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if piece.side == "Black":
+            self.fullmove_number += 1
+
+        piece.move_count += 1
+        self.switch_turn()
+
+        # a two tile pawn move can be captured en passant on the next move only
+        if piece.kind == PAWN and abs(to_sq - from_sq) == 16:
+            self.en_passant_target = ((from_sq + to_sq) // 16, to_col)
+            self.zobrist_key ^= self.en_passant_key()
+
+        if self.debug_eval:
+            self.check_eval()
+
+    # take back the last move made with make_move
+    def unmake_move(self):
+        move, piece, captured, castling_rights, en_passant_target, halfmove_clock, zobrist_key = self.undo_stack.pop()
+        from_sq, to_sq = move_from(move), move_to(move)
+        from_row, from_col = row_col(from_sq)
+        to_row = to_sq >> 3
+
+        self.switch_turn()
+        piece.move_count -= 1
+        if piece.side == "Black":
+            self.fullmove_number -= 1
+        self.castling_rights = castling_rights
+        self.en_passant_target = en_passant_target
+        self.halfmove_clock = halfmove_clock
+
+        if piece.kind == KING and abs(to_sq - from_sq) == 2:
+            rook = self.squares[(from_sq + to_sq) // 2]
+            self.relocate_piece(rook, to_row, 7 if to_sq > from_sq else 0)
+            rook.move_count -= 1
+
+        if move_promotion(move):
+            self.remove_piece(self.squares[to_sq])
+            piece.row, piece.column = from_row, from_col
+            self.add_piece(piece)
+        else:
+            self.relocate_piece(piece, from_row, from_col)
+
+        if captured:
+            self.add_piece(captured)
+
+        self.zobrist_key = zobrist_key
+
+        if self.debug_eval:
+            self.check_eval()
+
+    # hand the move to the other side
+    def switch_turn(self):
+        self.zobrist_key ^= self.en_passant_key()   # whether en passant counts depends on who is to move
+        self.turn = other_side(self.turn)
+        self.zobrist_key ^= SIDE_KEY ^ self.en_passant_key()
+
+    # the en passant target only changes the hash when the side to move has a pawn that could take it
+    def en_passant_key(self):
+        if not self.en_passant_target:
+            return 0
+        row, col = self.en_passant_target
+        if PAWN_ATTACKS[other_side(self.turn)][square(row, col)] & self.pieces[self.turn][PAWN]:
+            return EN_PASSANT_KEYS[col]
+        return 0
+
+    # work the zobrist key out from scratch, used to check the incremental key
+    def compute_zobrist(self):
+        key = CASTLING_KEYS[self.castling_rights] ^ self.en_passant_key()
+        if self.turn == "Black":
+            key ^= SIDE_KEY
+        for sq in iter_squares(self.all_occupied):
+            piece = self.squares[sq]
+            key ^= PIECE_KEYS[piece.side][piece.kind][sq]
+        return key
+
+    # work the evaluation totals out from scratch, returns (material, positional) like the running totals
+    def compute_eval(self):
+        material = {"White": 0, "Black": 0}
+        positional = {"White": 0, "Black": 0}
+        for sq in iter_squares(self.all_occupied):
+            piece = self.squares[sq]
+            material[piece.side] += PIECE_VALUES[piece.kind]
+            positional[piece.side] += SQUARE_BONUS[piece.side][piece.kind][sq]
+        return material, positional
+
+    # debug check that the running totals still match the board
+    def check_eval(self):
+        material, positional = self.compute_eval()
+        if material != self.material or positional != self.positional:
+            raise AssertionError("evaluation totals out of sync: running %s %s, recomputed %s %s"
+                                 % (self.material, self.positional, material, positional))
+
+    # piece standing on a tile or None
+    def piece_at(self, row, col):
+        return self.squares[square(row, col)]
+
+    def is_occupied(self, row, col):
+        return bool(self.all_occupied & bit(row, col))
 
     # change the position of a piece
     def move_piece(self, piece, new_row, new_col, game):
         if piece.side != game.turn:     # dont move if its not their turn
             return
         
-        # keep track of where the piece was and where its going
-        old_row, old_col = piece.row, piece.column
-        captured_piece = self.board_positions[new_row][new_col]["piece"]
-        captured_occupied = self.board_positions[new_row][new_col]["occupied"]
-        promo_row = 0 if piece.side == "White" else 7
-        
-        # en passant
-        if isinstance(piece, Pawn) and game.en_passant_target == (new_row, new_col):
-            direction = -1 if piece.side == "White" else 1
-            captured_row = new_row - direction
-            captured_piece = self.board_positions[captured_row][new_col]["piece"]
-
-            if captured_piece:
-                if captured_piece.side == "White":
-                    self.white_pieces.remove(captured_piece)
-                else:
-                    self.black_pieces.remove(captured_piece)
-
-            if isinstance(captured_piece, Pawn) and captured_piece.side != piece.side:
-                self.board_positions[captured_row][new_col]["piece"] = None
-                self.board_positions[captured_row][new_col]["occupied"] = False
-        
         # castling logic
+        old_row, old_col = piece.row, piece.column
         if isinstance(piece, King) and abs(new_col - old_col) == 2:
             rook_col = 0 if new_col < old_col else 7
             game.handle_castling(old_row, old_col, old_row, rook_col)
             return
-        
-        # change status of the old position
-        self.board_positions[old_row][old_col]["occupied"] = False
-        self.board_positions[old_row][old_col]["piece"] = None
-        
 
-        piece.row = new_row     # change the pieces data
-        piece.column = new_col
-        self.board_positions[new_row][new_col]["occupied"] = True   # change the state of the new tile
-        self.board_positions[new_row][new_col]["piece"] = piece
+        # pawns reaching the last row become a queen until the player picks something else
+        move = encode_move(square(old_row, old_col), square(new_row, new_col))
+        if isinstance(piece, Pawn) and new_row in (0, 7):
+            move = encode_move(square(old_row, old_col), square(new_row, new_col), QUEEN)
 
-        # dont allow a move that puts the king in check
-        if self.is_in_check(piece.side):
-            piece.row, piece.column = old_row, old_col
-            self.board_positions[old_row][old_col]["occupied"] = True
-            self.board_positions[old_row][old_col]["piece"] = piece
-            
-            self.board_positions[new_row][new_col]["occupied"] = False
-            self.board_positions[new_row][new_col]["piece"] = None
-
-            self.board_positions[new_row][new_col]["occupied"] = captured_occupied
-            self.board_positions[new_row][new_col]["piece"] = captured_piece
-
-            return
-        
-        # pawn promotion
-        if isinstance(piece, Pawn) and new_row == promo_row:
-            game.promoting_pawn = piece
-            self.selected_piece = None
-            self.valid_moves = []
-            self.dragging = False
-            
-
-        piece.move_count += 1   # increase the move count so that some moves arent possible anymore
+        if move in self.legal_moves():      # dont allow a move that puts the king in check
+            self.make_move(move)
 
     # put the remaining pieces on each side into a list
     def list_piece(self):
-        self.white_pieces = []
-        self.black_pieces = []
-        for row in range(8):
-            for col in range(8):    # go through the board
-                piece = self.board_positions[row][col]["piece"]
-                if piece != None:
-                    if piece.side == "White":
-                        self.white_pieces.append(piece) # add white pieces to white piece list
-                    else:
-                        self.black_pieces.append(piece) # add black pieces to black piece list
+        self.white_pieces = [self.squares[sq] for sq in iter_squares(self.occupied["White"])]
+        self.black_pieces = [self.squares[sq] for sq in iter_squares(self.occupied["Black"])]
         return self.white_pieces, self.black_pieces
 
     def is_in_check(self, side):
         king = self.white_king if side == "White" else self.black_king
-        king_pos = (king.row, king.column)
-
-        for row in range(8):
-            for col in range(8):    # iterate across the whole board
-                space = self.board_positions[row][col]
-                if space["occupied"]:
-                    piece = space["piece"]
-                    if piece and piece.side != side:
-                        if isinstance(piece, Pawn):
-                            moves = piece.get_valid_moves(self, ignore_check=True)
-                        else:
-                            moves = piece.get_valid_moves(self, ignore_check=True)
-                        if king_pos in moves:
-                            return True
-                    
+        return bool(self.attacked[other_side(side)] & bit(king.row, king.column))
 
+    # stops at the first legal move found instead of listing them all
+    def has_legal_move(self):
+        for move in self.legal_moves():
+            return True
         return False
 
-    #handle mouse click
-    def handle_mouse_down(self, mouse_x, mouse_y, game):
-        col = (mouse_x - self.margin) // self.size
-        row = (mouse_y - self.margin) // self.size
-
-        if 0 <= row < 8 and 0 <= col < 8:
-            space = self.board_positions[row][col]
-            if space["occupied"]:
-                self.selected_piece = space["piece"]
-                if self.selected_piece.side != game.turn:
-                    return
-                if isinstance(self.selected_piece, Pawn):
-                    self.valid_moves = self.selected_piece.get_valid_moves(self, en_passant_target = game.en_passant_target)
-                else:
-                    self.valid_moves = self.selected_piece.get_valid_moves(self)
-
-                self.dragging = True
-                self.drag_offset_x = mouse_x
-                self.drag_offset_y = mouse_y
-
-    # handle mouse dragging
-    def handle_mouse_motion(self, mouse_x, mouse_y):
-        if self.dragging:
-            self.drag_offset_x = mouse_x
-            self.drag_offset_y = mouse_y
-
-    # handle mouse release
-    def handle_mouse_up(self, mouse_x, mouse_y, game):
-        if not self.dragging or not self.selected_piece:
-            return
-        
-        col = (mouse_x - self.margin) // self.size
-        row = (mouse_y - self.margin) // self.size
-
-        if 0 <= row < 8 and 0 <= col < 8:
-            if (row, col) in self.valid_moves:
-                old_row = self.selected_piece.row
-                self.move_piece(self.selected_piece, row, col, game)
-
-                # set an en passant target
-                if isinstance(self.selected_piece, Pawn) and abs(row - old_row) == 2:
-                    middle_row = (row + old_row) // 2
-                    game.en_passant_target = (middle_row, col)
-
-                # promotion
-                if isinstance(self.selected_piece, Pawn) and (row == 0 or row == 7):
-                    game.promoting_pawn = self.selected_piece
-                    game.switch_turn()
-                    self.selected_piece = None
-                    self.valid_moves = []
-                    self.dragging = False
-                    return
-                
-                game.switch_turn()
-                self.list_piece()
-
-                if game.is_checkmate() or game.is_stalemate():
-                    game.is_over = True
-
-        self.selected_piece = None
-        self.valid_moves = []
-        self.dragging = False
\ No newline at end of file
+    # how many times the current position has come up, counting this time
+    # only positions since the last capture or pawn move can be the same, the undo records keep their keys
+    def repetitions(self):
+        count = 1
+        for record in self.undo_stack[-1:-self.halfmove_clock - 1:-1]:
+            if record[6] == self.zobrist_key:
+                count += 1
+        return count
+
+    # neither side can ever checkmate: kings with at most one knight or bishop, or only bishops all on one colour
+    def insufficient_material(self):
+        white, black = self.pieces["White"], self.pieces["Black"]
+        if white[PAWN] | black[PAWN] | white[ROOK] | black[ROOK] | white[QUEEN] | black[QUEEN]:
+            return False
+        knights = white[KNIGHT] | black[KNIGHT]
+        bishops = white[BISHOP] | black[BISHOP]
+        if not knights and (not bishops & LIGHT_SQUARES or not bishops & ~LIGHT_SQUARES):
+            return True
+        return not bishops and not knights & (knights - 1)       # one knight at most
@@ -0,0 +1,206 @@
+import pygame
+import sprites
+from bitboard import row_col
+from pieces import Pawn
+from game import PROMOTION_KINDS
+
+# the pygame side of the board: drawing, piece images and the mouse
+# the rules in board.py, pieces.py and game.py never touch pygame so they can run without a display
+class BoardView:
+    def __init__(self, size = 60, margin = 60, border = 5, piece_size = sprites.PIECE_SIZE):
+
+        # board visuals
+        pygame.font.init()
+        self.size = size
+        self.margin = margin
+        self.border = border
+        self.border_color = (0, 0, 0)
+        self.colors = [(4, 62, 133), (138 , 96, 96)]
+        self.font = pygame.font.Font(None, 24)
+        self.piece_size = piece_size
+        sprites.preload(piece_size)
+        self.background = None      # built on the first draw, it needs the screen
+
+        # setup for movement
+        self.reset()
+
+    # forget the piece being moved, used when a new game starts
+    def reset(self):
+        self.selected_piece = None
+        self.valid_moves = []
+        self.dragging = False
+        self.drag_offset_x = 0
+        self.drag_offset_y = 0
+        self.invalidate()
+
+    # make the next draw put the whole board back on the screen, for when something else was drawn over it
+    def invalidate(self):
+        self.layer_state = None
+        self.drag_rect = None
+
+    # tiles, border and labels never change, so they are drawn once onto their own surface
+    def build_background(self, screen):
+        background = pygame.Surface(screen.get_size()).convert()
+        background.fill((255, 255, 255))
+        offset = self.margin
+        border_offset = self.margin - self.border
+        board_size = self.size * 8
+
+        # draw the outside border
+        pygame.draw.rect(background, self.border_color,
+                         (border_offset, border_offset,
+                          board_size + 2 * self.border, board_size + 2 * self.border),
+                          self.border)
+
+        # draw the board tiles
+        for row in range(8):
+            for col in range(8):
+                color = self.colors[(row + col) % 2]
+                pygame.draw.rect(background, color, self.tile_rect(row, col))
+
+        # label the rows
+        for row in range(8):
+            label = self.font.render(str(8 - row), True, (0, 0, 0))
+            background.blit(label, (self.margin // 2, 10 + row * self.size + offset + self.size // 4)) # +10 to align to the center of the square
+
+        # label the columns
+        columns = "ABCDEFGH"
+        for col in range(8):
+            label = self.font.render(columns[col], True, (0, 0, 0))
+            background.blit(label, (10 + col * self.size + offset + self.size // 4, self.margin // 2)) # +10 to align to the center of the square
+
+        return background
+
+    # the background with the move highlights and every piece that isnt being dragged
+    def build_layer(self, board):
+        layer = self.background.copy()
+        for sq in range(64):
+            row, col = row_col(sq)
+            rect = self.tile_rect(row, col)
+            if self.selected_piece and (row, col) in self.valid_moves:  # add a green border to tiles that are within valid moves
+                pygame.draw.rect(layer, (0, 255, 0), rect, 4)
+
+            piece = board.squares[sq]
+            if piece and (piece != self.selected_piece or not self.dragging):
+                image_surface = sprites.get(piece.side, piece.kind, self.piece_size)
+                layer.blit(image_surface, image_surface.get_rect(center = rect.center))
+        return layer
+
+    def tile_rect(self, row, col):
+        return pygame.Rect(self.margin + col * self.size, self.margin + row * self.size, self.size, self.size)
+
+    # what the piece layer shows, it only has to be built again when this changes
+    def current_state(self, board):
+        selected = (self.selected_piece.row, self.selected_piece.column) if self.selected_piece else None
+        return board.zobrist_key, len(board.undo_stack), selected, self.dragging
+
+    # draw the board, returns the parts of the screen that changed for pygame.display.update
+    # full puts the whole board back even if nothing changed, for when something is drawn on top of it every frame
+    def draw(self, screen, board, full = False):
+        if self.background is None:
+            self.background = self.build_background(screen)
+
+        dirty = []
+        state = self.current_state(board)
+        if state != self.layer_state:   # a move was made or a piece picked up or put down
+            self.layer = self.build_layer(board)
+            self.layer_state = state
+            full = True
+        if full:
+            screen.blit(self.layer, (0, 0))
+            dirty.append(screen.get_rect())
+            self.drag_rect = None
+
+        # while dragging only the tiles under the old and new spot of the piece are drawn again
+        if self.dragging and self.selected_piece:
+            image_surface = sprites.get(self.selected_piece.side, self.selected_piece.kind, self.piece_size)
+            rect = image_surface.get_rect(center = (self.drag_offset_x, self.drag_offset_y))
+            if rect != self.drag_rect:
+                if self.drag_rect:
+                    screen.blit(self.layer, self.drag_rect, self.drag_rect)
+                    dirty.append(self.drag_rect)
+                screen.blit(image_surface, rect)
+                dirty.append(rect)
+                self.drag_rect = rect
+
+        return dirty
+
+    # the bar of pieces a pawn can promote to, and where each one sits
+    def promotion_buttons(self, side):
+        bar_x = 180
+        bar_y = 0 if side == "White" else 540
+        buttons = {}
+        for i, name in enumerate(["Rook", "Knight", "Bishop", "Queen"]):
+            buttons[name] = pygame.Rect(bar_x + i * 60, bar_y, 60, 60)
+        return buttons
+
+    # draw promotion options
+    def draw_promotion(self, screen, game):
+        pawn = game.promoting_pawn
+        if not pawn:
+            return
+
+        buttons = self.promotion_buttons(pawn.side)
+        choice_background = pygame.Rect(buttons["Rook"].x, buttons["Rook"].y, 240, 60)
+        pygame.draw.rect(screen, "grey", choice_background)
+        for name, rect in buttons.items():
+            screen.blit(sprites.get(pawn.side, PROMOTION_KINDS[name], self.piece_size), rect.topleft)
+
+    #handle mouse click
+    def handle_mouse_down(self, mouse_x, mouse_y, game):
+        board = game.board
+
+        # while a pawn is promoting the only thing to click is the choice of piece
+        if game.promoting_pawn:
+            for name, rect in self.promotion_buttons(game.promoting_pawn.side).items():
+                if rect.collidepoint(mouse_x, mouse_y):
+                    game.promote(name)
+                    break
+            return
+
+        col = (mouse_x - self.margin) // self.size
+        row = (mouse_y - self.margin) // self.size
+
+        if 0 <= row < 8 and 0 <= col < 8:
+            piece = board.piece_at(row, col)
+            if piece:
+                self.selected_piece = piece
+                if self.selected_piece.side != game.turn:
+                    return
+                if isinstance(self.selected_piece, Pawn):
+                    self.valid_moves = self.selected_piece.get_valid_moves(board, en_passant_target = game.en_passant_target)
+                else:
+                    self.valid_moves = self.selected_piece.get_valid_moves(board)
+
+                self.dragging = True
+                self.drag_offset_x = mouse_x
+                self.drag_offset_y = mouse_y
+
+    # handle mouse dragging
+    def handle_mouse_motion(self, mouse_x, mouse_y):
+        if self.dragging:
+            self.drag_offset_x = mouse_x
+            self.drag_offset_y = mouse_y
+
+    # handle mouse release
+    def handle_mouse_up(self, mouse_x, mouse_y, game):
+        if not self.dragging or not self.selected_piece:
+            return
+        board = game.board
+
+        col = (mouse_x - self.margin) // self.size
+        row = (mouse_y - self.margin) // self.size
+
+        if 0 <= row < 8 and 0 <= col < 8:
+            if (row, col) in self.valid_moves:
+                board.move_piece(self.selected_piece, row, col, game)
+
+                # promotion
+                if isinstance(self.selected_piece, Pawn) and (row == 0 or row == 7):
+                    game.promoting_pawn = board.piece_at(row, col)
+                    self.reset()
+                    return
+
+                game.outcome()
+
+        self.reset()
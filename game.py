@@ -1,169 +1,95 @@
 
-import pygame
 from board import Board
-from pieces import Pawn, Rook, Knight, Bishop, King, Queen
+from bitboard import KNIGHT, BISHOP, ROOK, QUEEN, square, encode_move, move_from, move_to, other_side
+from pieces import Rook, King
+
+PROMOTION_KINDS = {"Rook": ROOK, "Knight": KNIGHT, "Bishop": BISHOP, "Queen": QUEEN}
 
 class Game:
     def __init__(self):
         self.board = Board()
-        self.turn = "White"             # white always goes first
         self.selected_piece = None
         self.winner = None
         self.is_over = False
-        self.en_passant_target = None
         self.promoting_pawn = None
+        self.result = None              # (winner, reason) once the game is over, from outcome()
+        self.outcome_position = None
+
+    # whose turn it is and the en passant target live on the board so moves can be taken back
+    @property
+    def turn(self):
+        return self.board.turn
+
+    @property
+    def en_passant_target(self):
+        return self.board.en_passant_target
 
     # change turn
     def switch_turn(self):
-        self.turn = "Black" if self.turn == "White" else "White"
+        self.board.switch_turn()
         
 
     # castling logic
     def handle_castling(self, king_row, king_col, rook_row, rook_col):
-        king = self.board.board_positions[king_row][king_col]["piece"]  
-        rook = self.board.board_positions[rook_row][rook_col]["piece"]
-        if (king.side != self.turn) or king.side != rook.side:          # make sure it is your turn
-            return
+        king = self.board.piece_at(king_row, king_col)
+        rook = self.board.piece_at(rook_row, rook_col)
         if not isinstance(king, King) or not isinstance(rook, Rook):    # ensure selected piece is a king or rook
             return
-        if king.move_count != 0 or rook.move_count != 0:               # cannot castle if king or rook has moved
-            return
-        if self.board.is_in_check(king.side):
+        if (king.side != self.turn) or king.side != rook.side:          # make sure it is your turn
             return
-        
-        # tiles between king and rook should be empty and king cannot move into check
-        col_diff = king_col - rook_col
-        direction = -1 if col_diff > 0 else 1
-
-        start = min(king_col, rook_col) + 1
-        end = max(king_col, rook_col)
-
-        for col in range(start, end):
-            if self.board.board_positions[king_row][col]["occupied"]:
-                return
-            
-            #simulate king moving one tile at a time to see if it would pass into check
-            old_col = king.column
-            king.column = col
-
-            self.board.board_positions[king_row][old_col]["piece"] = None 
-            self.board.board_positions[king_row][col]["piece"] = king
-
-            in_check = self.board.is_in_check(king.side)
-
-            # undo simulation
-            self.board.board_positions[king_row][col]["piece"] = None
-            self.board.board_positions[king_row][old_col]["piece"] = king
-
-            if in_check:
-                return
-            
-        # determine new positions
-        new_king_col = king_col + 2 * direction
-        new_rook_col = king_col + direction
-
-        # clear old positions
-        self.board.board_positions[king_row][king_col]["piece"] = None
-        self.board.board_positions[king_row][king_col]["occupied"] = False
-        self.board.board_positions[rook_row][rook_col]["piece"] = None
-        self.board.board_positions[rook_row][rook_col]["occupied"] = False
-
-        # place king
-        king.column = new_king_col
-        self.board.board_positions[king_row][new_king_col]["piece"] = king
-        self.board.board_positions[king_row][new_king_col]["occupied"] = True
-
-        # place rook
-        rook.column = new_rook_col
-        self.board.board_positions[king_row][new_rook_col]["piece"] = rook
-        self.board.board_positions[king_row][new_rook_col]["occupied"] = True
-
-        king.move_count += 1
-        rook.move_count += 1
-
-
-
-    # promote pawn to another piece
-    def handle_promotion(self, screen, mouse_x, mouse_y):
-        pawn = self.promoting_pawn
-        if not pawn:
+
+        # the board only lists the castle while the rights are kept, the tiles between are empty
+        # and the king does not start in, pass through or land on an attacked tile
+        direction = 1 if rook_col > king_col else -1
+        move = encode_move(square(king_row, king_col), square(king_row, king_col + 2 * direction))
+        if move in self.board.legal_moves():
+            self.board.make_move(move)
+
+
+
+    # play a packed move without the mouse (used by the ai) and see if it ended the game
+    def play_move(self, move):
+        self.board.make_move(move)
+        self.outcome()
+
+    # promote pawn to another piece, name is one of PROMOTION_KINDS
+    def promote(self, name):
+        if not self.promoting_pawn:
             return
 
-        bar_x = 180
-        bar_y = 0 if pawn.side == "White" else 540
-
-        self.promo_images = {
-            "Rook": pygame.image.load('assets/White Rook.png' if pawn.side == "White" else 'assets/Black Rook.png'),
-            "Knight": pygame.image.load('assets/White Knight.png' if pawn.side == "White" else 'assets/Black Knight.png'),
-            "Bishop": pygame.image.load('assets/White Bishop.png' if pawn.side == "White" else 'assets/Black Bishop.png'),
-            "Queen": pygame.image.load('assets/White Queen.png' if pawn.side == "White" else 'assets/Black Queen.png'),
-        }
-
-        # draw promotion options
-        choice_background = pygame.Rect(bar_x, bar_y, 240, 60)
-        pygame.draw.rect(screen, "grey", choice_background)
-        buttons = {}
-        for i, (name, img) in enumerate(self.promo_images.items()):
-            x = bar_x + i * 60
-            screen.blit(img, (x, bar_y))
-            buttons[name] = pygame.Rect(x, bar_y, 60, 60)
-
-        # handle click
-        for event in pygame.event.get():
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                for name, rect in buttons.items():
-                    if rect.collidepoint(mouse_x, mouse_y):
-                        row, col = pawn.row, pawn.column
-                        # Replace pawn with new piece
-                        if name == "Rook":
-                            new_piece = Rook(pawn.side, row, col, pawn.board)
-                        elif name == "Knight":
-                            new_piece = Knight(pawn.side, row, col, pawn.board)
-                        elif name == "Bishop":
-                            new_piece = Bishop(pawn.side, row, col, pawn.board)
-                        else:
-                            new_piece = Queen(pawn.side, row, col, pawn.board)
-
-                        self.board.board_positions[row][col]["piece"] = new_piece
-                        self.promoting_pawn = None  # done with promotion
-                        break
-                
-
-    # check for checkmate - in check with no valid moves
-    def is_checkmate(self):
-        # choose the list of your sides pieces
-        self.board.list_piece()
-        pieces = self.board.white_pieces if self.turn == "White" else self.board.black_pieces
-        if self.board.is_in_check(self.turn):               # function that looks for check
-            for piece in pieces: 
-                if isinstance(piece, Pawn): 
-                    moves = piece.get_valid_moves(self.board, en_passant_target = self.en_passant_target)   # check valid moves
-                else:
-                    moves = piece.get_valid_moves(self.board)
-                if moves:                                   # if not empty there are valid moves so no checkmate
-                    return False
-
-            self.winner = "Black" if self.turn == "White" else "White"  # winner is the opposite of whose turn it is since turn switches immediatley after a move
-            self.is_over = True                                         # bool for ending game
-            return True
-            
-        return False
-
-    # check for stalemate - not in check but no valid moves
-    def is_stalemate(self):
-        self.board.list_piece()
-        pieces = self.board.white_pieces if self.turn == "White" else self.board.black_pieces
-        if not self.board.is_in_check(self.turn):           # looks to see if the there isn't check
-            for piece in pieces:
-                if isinstance(piece, Pawn):
-                    moves = piece.get_valid_moves(self.board, en_passant_target = self.en_passant_target)   # check the valid moves
-                else:
-                    moves = piece.get_valid_moves(self.board)
-                if moves:                                   # if there are valid moves no stalemate
-                    return False
-            self.winner = "Draw"
+        # the pawn was played as a queen, take it back and play the chosen piece instead
+        move = self.board.undo_stack[-1][0]
+        self.board.unmake_move()
+        self.board.make_move(encode_move(move_from(move), move_to(move), PROMOTION_KINDS[name]))
+        self.promoting_pawn = None  # done with promotion
+        self.outcome()
+
+    # how the game stands after the last move: None while it goes on, otherwise (winner, reason) with winner
+    # "White", "Black" or "Draw", and winner and is_over are set. worked out once per position, asking again is free
+    # one legal move is enough to know it isnt checkmate or stalemate, so the moves are never all listed
+    def outcome(self):
+        board = self.board
+        position = (board.zobrist_key, len(board.undo_stack))
+        if position == self.outcome_position:
+            return self.result
+        self.outcome_position = position
+
+        if not board.has_legal_move():
+            if board.is_in_check(self.turn):
+                result = (other_side(self.turn), "checkmate")     # the side to move lost
+            else:
+                result = ("Draw", "stalemate")
+        elif board.halfmove_clock >= 100:
+            result = ("Draw", "fifty moves")
+        elif board.repetitions() >= 3:
+            result = ("Draw", "repetition")
+        elif board.insufficient_material():
+            result = ("Draw", "insufficient material")
+        else:
+            result = None
+
+        self.result = result
+        if result:
+            self.winner = result[0]
             self.is_over = True
-            return True
-
-        return False
-    
\ No newline at end of file
+        return result
@@ -1,200 +1,319 @@
 import pygame
+from ai_worker import AIWorker
+from bitboard import move_name
 from game import Game
+from board_view import BoardView
 
-# set up the app window
-pygame.init()
 WIDTH, HEIGHT = 600, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Chess")
-
-# set the font for text
-font = pygame.font.SysFont("Georgia", 30, bold=True)
 
 # buttons for the menu
-quit_text = font.render("Quit", True, "black")
 quit_button = pygame.Rect(250, 400, 100, 60)
-quit_text_center = quit_text.get_rect(center = quit_button.center)
-
-vs_ai_text = font.render("Versus AI", True, "black")
 vs_ai_button = pygame.Rect(175, 300, 250, 60)
-vs_ai_text_center = vs_ai_text.get_rect(center = vs_ai_button.center)
-
-vs_player_text = font.render("Versus Player", True, "black")
 vs_player_button = pygame.Rect(175, 200, 250, 60)
-vs_player_text_center = vs_player_text.get_rect(center = vs_player_button.center)
 
 # game over buttons
-play_again_text = font.render("Play Again", True, "black")
 play_again_button = pygame.Rect(175, 300, 250, 60)
-play_again_text_center = play_again_text.get_rect(center = play_again_button.center)
-
-main_menu_text = font.render("Main Menu", True, "black")
 main_menu_button = pygame.Rect(175, 400, 250, 60)
-main_menu_text_center = main_menu_text.get_rect(center = main_menu_button.center)
 
-# title text
-chess_font = font.render("Chess", True, "black")
+# ai settings
+AI_SIDE = "Black"
+AI_TIME_LIMIT = 1.0     # longest the window waits on the ai, in seconds
+AI_PONDER = True        # let the ai keep thinking on the players time, for a few times AI_TIME_LIMIT at most
 
-# game states
-state = "menu"  # "menu", "game_player", "game_ai"
+# the ai thinks on its own thread and posts its progress and moves back as events
+AI_EVENT = pygame.event.custom_type()
 
-game = Game()
-clock = pygame.time.Clock()
+def post_ai_event(message):
+    pygame.event.post(pygame.event.Event(AI_EVENT, message))
 
-running = True
+# the loop sleeps until an event comes in and only draws when something changed
+IDLE_WAIT_MS = 500      # longest it sleeps at a time
+DRAG_FPS = 60
 
-while running:
-    screen.fill((255, 255, 255))
-
-    mouse_x, mouse_y = pygame.mouse.get_pos()
-
-    # main menu code
+# the button under the mouse, it is drawn lighter
+def hovered_button(mouse_x, mouse_y, state, game):
     if state == "menu":
-
-        # draw buttons
-        if quit_button.x <= mouse_x <= quit_button.x + 100 and quit_button.y <= mouse_y <= quit_button.y + 60:
-            pygame.draw.rect(screen, (180, 180, 180), quit_button)
+        buttons = [quit_button, vs_ai_button, vs_player_button]
+    elif game.is_over:
+        buttons = [play_again_button, main_menu_button]
+    else:
+        return None
+    for button in buttons:
+        if button.collidepoint(mouse_x, mouse_y):
+            return button
+    return None
+
+# everything that opens the window or runs the game is in main, so processes started for the parallel
+# search can import this file without opening another window
+def main():
+    # set up the app window
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Chess")
+
+    # set the font for text
+    font = pygame.font.SysFont("Georgia", 30, bold=True)
+    status_font = pygame.font.SysFont("Georgia", 18)
+
+    # text for the buttons
+    quit_text = font.render("Quit", True, "black")
+    quit_text_center = quit_text.get_rect(center = quit_button.center)
+
+    vs_ai_text = font.render("Versus AI", True, "black")
+    vs_ai_text_center = vs_ai_text.get_rect(center = vs_ai_button.center)
+
+    vs_player_text = font.render("Versus Player", True, "black")
+    vs_player_text_center = vs_player_text.get_rect(center = vs_player_button.center)
+
+    # text for the game over buttons
+    play_again_text = font.render("Play Again", True, "black")
+    play_again_text_center = play_again_text.get_rect(center = play_again_button.center)
+
+    main_menu_text = font.render("Main Menu", True, "black")
+    main_menu_text_center = main_menu_text.get_rect(center = main_menu_button.center)
+
+    # title text
+    chess_font = font.render("Chess", True, "black")
+
+    # game states
+    state = "menu"  # "menu", "game_player", "game_ai"
+
+    game = Game()
+    view = BoardView()
+    ai = AIWorker(AI_TIME_LIMIT, post_ai_event)
+    ai_status = None    # what the ai is looking at, shown under the board while it thinks
+    clock = pygame.time.Clock()
+
+    running = True
+    redraw = True
+    hovered = None
+
+    while running:
+        # wait for something to happen, the frame rate is only kept up while a piece is being dragged
+        if view.dragging:
+            clock.tick(DRAG_FPS)    # limit the frame rate so that my laptop does not sound like a jet engine
+            events = pygame.event.get()
+        elif redraw:
+            events = pygame.event.get()
         else:
-            pygame.draw.rect(screen, (110, 110, 110), quit_button)
+            event = pygame.event.wait(IDLE_WAIT_MS)
+            events = [] if event.type == pygame.NOEVENT else [event] + pygame.event.get()
+
+        # event handling
+        for event in events:
+            # quit
+            if event.type == pygame.QUIT:
+                running = False
+
+            # the ai finished a depth or picked its move, anything from a cancelled search is dropped
+            elif event.type == AI_EVENT:
+                if event.job != ai.job or state != "game_ai":
+                    continue
+                if event.kind == "progress" and not event.ponder:
+                    ai_status = "depth %d  %s  %d nodes" % (event.depth, move_name(event.move) if event.move else "-", event.nodes)
+                    redraw = True
+                elif event.kind == "done":
+                    if not ai.accept(event.job):
+                        continue
+                    ai_status = None
+                    if event.move and event.move in game.board.legal_moves():     # never play a move the board has moved on from
+                        game.play_move(event.move)
+                        if AI_PONDER and not game.is_over:
+                            ai.ponder(game.board)
+                    view.invalidate()
+                    redraw = True
+
+            # the window was covered or restored, put everything back
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                view.invalidate()
+                redraw = True
+
+            # mouse down
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                mouse_x, mouse_y = event.pos
+                redraw = True
+
+                if state == "menu":
+                    # button select logic
+                    if quit_button.collidepoint(mouse_x, mouse_y):
+                        running = False
+                    elif vs_player_button.collidepoint(mouse_x, mouse_y):
+                        state = "game_player"
+                        game.__init__()
+                        view.reset()
+                        ai.cancel()
+                    elif vs_ai_button.collidepoint(mouse_x, mouse_y):
+                        state = "game_ai"
+                        game.__init__()
+                        view.reset()
+                        ai.cancel()
+
+                # select piece logic
+                elif state == "game_player":
+                    if not game.is_over:
+                        view.handle_mouse_down(mouse_x, mouse_y, game)
+                    else:
+                        if play_again_button.collidepoint(mouse_x, mouse_y):
+                            game.__init__()
+                            view.reset()
+                            ai.cancel()
+                        elif main_menu_button.collidepoint(mouse_x, mouse_y):
+                            state = "menu"
+                            game.is_over = False
+                            ai.cancel()
+
+                elif state == "game_ai":
+                    if not game.is_over:
+                        if game.turn != AI_SIDE:    # the ais pieces cant be picked up, even while it is thinking
+                            view.handle_mouse_down(mouse_x, mouse_y, game)
+
+                    else:
+                        if play_again_button.collidepoint(mouse_x, mouse_y):
+                            game.__init__()
+                            view.reset()
+                            ai.cancel()
+                        elif main_menu_button.collidepoint(mouse_x, mouse_y):
+                            state = "menu"
+                            game.is_over = False
+                            ai.cancel()
+
+            # drag piece logic
+            elif event.type == pygame.MOUSEMOTION:
+                if state in ["game_player", "game_ai"]:
+                    if view.dragging:
+                        mouse_x, mouse_y = event.pos
+                        view.handle_mouse_motion(mouse_x, mouse_y)
+                        redraw = True
+
+                # buttons only need drawing again when the mouse moves onto or off one
+                button = hovered_button(*event.pos, state, game)
+                if button != hovered:
+                    hovered = button
+                    redraw = True
+
+            # release piece logic
+            elif event.type == pygame.MOUSEBUTTONUP:
+                redraw = True
+                if state in ["game_player", "game_ai"]:
+                    if not game.promoting_pawn:
+                        mouse_x, mouse_y = event.pos
+                        view.handle_mouse_up(mouse_x, mouse_y, game)
+
+        if not redraw:
+            continue
+        redraw = False
+
+        mouse_x, mouse_y = pygame.mouse.get_pos()
+        dirty = None    # parts of the screen to update, None is the whole window
+
+        # main menu code
+        if state == "menu":
+            screen.fill((255, 255, 255))
+
+            # draw buttons
+            if quit_button.x <= mouse_x <= quit_button.x + 100 and quit_button.y <= mouse_y <= quit_button.y + 60:
+                pygame.draw.rect(screen, (180, 180, 180), quit_button)
+            else:
+                pygame.draw.rect(screen, (110, 110, 110), quit_button)
 
-        if vs_ai_button.x <= mouse_x <= vs_ai_button.x + 250 and vs_ai_button.y <= mouse_y <= vs_ai_button.y + 60:
-            pygame.draw.rect(screen, (180, 180, 180), vs_ai_button)
-        else: 
-            pygame.draw.rect(screen, (110, 110, 110), vs_ai_button)
+            if vs_ai_button.x <= mouse_x <= vs_ai_button.x + 250 and vs_ai_button.y <= mouse_y <= vs_ai_button.y + 60:
+                pygame.draw.rect(screen, (180, 180, 180), vs_ai_button)
+            else: 
+                pygame.draw.rect(screen, (110, 110, 110), vs_ai_button)
 
-        if vs_player_button.x <= mouse_x <= vs_player_button.x + 250 and vs_player_button.y <= mouse_y <= vs_player_button.y + 60:
-            pygame.draw.rect(screen, (180, 180, 180), vs_player_button)
-        else:
-            pygame.draw.rect(screen, (110, 110, 110), vs_player_button)
+            if vs_player_button.x <= mouse_x <= vs_player_button.x + 250 and vs_player_button.y <= mouse_y <= vs_player_button.y + 60:
+                pygame.draw.rect(screen, (180, 180, 180), vs_player_button)
+            else:
+                pygame.draw.rect(screen, (110, 110, 110), vs_player_button)
 
 
-        screen.blit(quit_text, quit_text_center)
-        screen.blit(vs_ai_text, vs_ai_text_center)
-        screen.blit(vs_player_text, vs_player_text_center)
-        screen.blit(chess_font, (250, 100))
+            screen.blit(quit_text, quit_text_center)
+            screen.blit(vs_ai_text, vs_ai_text_center)
+            screen.blit(vs_player_text, vs_player_text_center)
+            screen.blit(chess_font, (250, 100))
 
-    # play vs another person
-    elif state == "game_player":
-        game.board.draw(screen)
+        # play vs another person
+        elif state == "game_player":
+            # the board is drawn again under anything that goes on top of it every frame
+            dirty = view.draw(screen, game.board, full = game.is_over or bool(game.promoting_pawn))
 
-        # end of game logic
-        if game.is_over:
-            winner_text = ""
-            if game.winner == "Draw":
-               winner_text = "Draw"
-            else:
-                winner_text = f"{game.winner} Wins!"
+            # end of game logic
+            if game.is_over:
+                winner_text = ""
+                if game.winner == "Draw":
+                   winner_text = "Draw"
+                else:
+                    winner_text = f"{game.winner} Wins!"
 
-            text_surface = font.render(winner_text, True, "red")
-            text_rect = text_surface.get_rect(center = (300, 200))
-            screen.blit(text_surface, text_rect)
+                text_surface = font.render(winner_text, True, "red")
+                text_rect = text_surface.get_rect(center = (300, 200))
+                screen.blit(text_surface, text_rect)
 
-            if play_again_button.x <= mouse_x <= play_again_button.x + 250 and play_again_button.y <= mouse_y <= play_again_button.y + 60:
-                pygame.draw.rect(screen, (180, 180, 180), play_again_button)
-            else:
-                pygame.draw.rect(screen, (110, 110, 110), play_again_button)
+                if play_again_button.x <= mouse_x <= play_again_button.x + 250 and play_again_button.y <= mouse_y <= play_again_button.y + 60:
+                    pygame.draw.rect(screen, (180, 180, 180), play_again_button)
+                else:
+                    pygame.draw.rect(screen, (110, 110, 110), play_again_button)
+
+                if main_menu_button.x <= mouse_x <= main_menu_button.x + 250 and main_menu_button.y <= mouse_y <= main_menu_button.y + 60:
+                    pygame.draw.rect(screen, (180, 180, 180), main_menu_button)
+                else: 
+                    pygame.draw.rect(screen, (110, 110, 110), main_menu_button)
+
+                screen.blit(play_again_text, play_again_text_center)
+                screen.blit(main_menu_text, main_menu_text_center)
+                dirty = None
+
+        # play vs an AI
+        elif state == "game_ai":
+            # the board is drawn again under anything that goes on top of it every frame
+            dirty = view.draw(screen, game.board, full = game.is_over or bool(game.promoting_pawn) or bool(ai_status))
+            if ai_status:
+                status_surface = status_font.render(ai_status, True, "black")
+                screen.blit(status_surface, status_surface.get_rect(center = (300, 570)))
+
+            # end of game logic
+            if game.is_over:
+                winner_text = ""
+                if game.winner == "Draw":
+                   winner_text = "Draw"
+                else:
+                    winner_text = f"{game.winner} Wins!"
 
-            if main_menu_button.x <= mouse_x <= main_menu_button.x + 250 and main_menu_button.y <= mouse_y <= main_menu_button.y + 60:
-                pygame.draw.rect(screen, (180, 180, 180), main_menu_button)
-            else: 
-                pygame.draw.rect(screen, (110, 110, 110), main_menu_button)
+                text_surface = font.render(winner_text, True, "red")
+                text_rect = text_surface.get_rect(center = (300, 200))
+                screen.blit(text_surface, text_rect)
 
-            screen.blit(play_again_text, play_again_text_center)
-            screen.blit(main_menu_text, main_menu_text_center)
+                if play_again_button.x <= mouse_x <= play_again_button.x + 250 and play_again_button.y <= mouse_y <= play_again_button.y + 60:
+                    pygame.draw.rect(screen, (180, 180, 180), play_again_button)
+                else:
+                    pygame.draw.rect(screen, (110, 110, 110), play_again_button)
 
-    # play vs an AI. the same as "game_player" until AI is added
-    elif state == "game_ai":
-        game.board.draw(screen)
+                if main_menu_button.x <= mouse_x <= main_menu_button.x + 250 and main_menu_button.y <= mouse_y <= main_menu_button.y + 60:
+                    pygame.draw.rect(screen, (180, 180, 180), main_menu_button)
+                else: 
+                    pygame.draw.rect(screen, (110, 110, 110), main_menu_button)
 
-        # end of game logic
-        if game.is_over:
-            winner_text = ""
-            if game.winner == "Draw":
-               winner_text = "Draw"
-            else:
-                winner_text = f"{game.winner} Wins!"
+                screen.blit(play_again_text, play_again_text_center)
+                screen.blit(main_menu_text, main_menu_text_center)
+                dirty = None
 
-            text_surface = font.render(winner_text, True, "red")
-            text_rect = text_surface.get_rect(center = (300, 200))
-            screen.blit(text_surface, text_rect)
+        if game.promoting_pawn:
+            view.draw_promotion(screen, game)
+            dirty = None
 
-            if play_again_button.x <= mouse_x <= play_again_button.x + 250 and play_again_button.y <= mouse_y <= play_again_button.y + 60:
-                pygame.draw.rect(screen, (180, 180, 180), play_again_button)
-            else:
-                pygame.draw.rect(screen, (110, 110, 110), play_again_button)
+        if dirty is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(dirty)
 
-            if main_menu_button.x <= mouse_x <= main_menu_button.x + 250 and main_menu_button.y <= mouse_y <= main_menu_button.y + 60:
-                pygame.draw.rect(screen, (180, 180, 180), main_menu_button)
-            else: 
-                pygame.draw.rect(screen, (110, 110, 110), main_menu_button)
-
-            screen.blit(play_again_text, play_again_text_center)
-            screen.blit(main_menu_text, main_menu_text_center)
-
-    if game.promoting_pawn:
-        game.handle_promotion(screen, mouse_x, mouse_y)
-
-    pygame.display.update()
-
-    # event handling
-    for event in pygame.event.get():
-        # quit
-        if event.type == pygame.QUIT:
-            running = False
-
-        # mouse down
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            mouse_x, mouse_y = event.pos
-
-            if state == "menu":
-                # button select logic
-                if quit_button.collidepoint(mouse_x, mouse_y):
-                    running = False
-                elif vs_player_button.collidepoint(mouse_x, mouse_y):
-                    state = "game_player"
-                    game.__init__()
-                elif vs_ai_button.collidepoint(mouse_x, mouse_y):
-                    state = "game_ai"
-                    game.__init__()
-
-            # select piece logic
-            elif state == "game_player":
-                if not game.is_over:
-                    game.board.handle_mouse_down(mouse_x, mouse_y, game)
-                else:
-                    if play_again_button.collidepoint(mouse_x, mouse_y):
-                        game.__init__()
-                    elif main_menu_button.collidepoint(mouse_x, mouse_y):
-                        state = "menu"
-                        game.is_over = False
+        # the ai plays black, it searches in the background until its time limit is used up
+        # and the move comes back as an AI_EVENT, if it was pondering on the right move it is nearly done already
+        if state == "game_ai" and game.turn == AI_SIDE and not game.is_over and not game.promoting_pawn and not ai.thinking:
+            ai.start(game.board)
 
-            elif state == "game_ai":
-                if game.is_over:
-                    game.board.handle_mouse_down(mouse_x, mouse_y, game)
+    # closes the game when running = False
+    ai.cancel()
+    pygame.quit()
 
-                else:
-                    if play_again_button.collidepoint(mouse_x, mouse_y):
-                        game.__init__()
-                    elif main_menu_button.collidepoint(mouse_x, mouse_y):
-                        state = "menu"
-                        game.is_over = False
-                
-        # drag piece logic
-        elif event.type == pygame.MOUSEMOTION:
-            if state in ["game_player", "game_ai"]:
-                if game.board.dragging:
-                    mouse_x, mouse_y = event.pos
-                    game.board.handle_mouse_motion(mouse_x, mouse_y)
-
-        # release piece logic
-        elif event.type == pygame.MOUSEBUTTONUP:
-            if state in ["game_player", "game_ai"]:
-                if not game.promoting_pawn:
-                    mouse_x, mouse_y = event.pos
-                    game.board.handle_mouse_up(mouse_x, mouse_y, game)
-
-    # limit the frame rate so that my laptop does not sound like a jet engine
-    clock.tick(60)
-
-# closes the game when running = False
-pygame.quit()
+if __name__ == "__main__":
+    main()
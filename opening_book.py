@@ -0,0 +1,164 @@
+# opening book, a sorted binary file of (position key, move, weight) entries in the Polyglot layout
+# the file is read through mmap and searched with a binary search, so nothing is loaded up front and
+# processes using the same book share it through the page cache
+#
+# each entry is 16 bytes, big endian: 8 byte key, 2 byte move, 2 byte weight, 4 byte learn (unused, 0)
+# keys are this engine's zobrist keys (zobrist.py) and moves are the packed moves from bitboard.py, so
+# books made by other Polyglot tools wont match, build one with:
+#   python opening_book.py build games.pgn [more.pgn ...] -o book.bin [--plies 20] [--min-games 2]
+#   python opening_book.py probe book.bin [--fen FEN]
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+
+from bitboard import move_name
+from board import Board
+from pgn import read_games, parse_san
+
+ENTRY = struct.Struct(">QHHI")
+KEY = struct.Struct(">Q")
+MAX_WEIGHT = 0xFFFF
+
+# points for a move by the result of the game, for the side that played it
+WIN_WEIGHT, DRAW_WEIGHT, LOSS_WEIGHT = 2, 1, 0
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.count = size // ENTRY.size
+        self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ) if size else b""
+
+    # every (move, weight) stored for a position key
+    def entries(self, key):
+        data = self.data
+        low, high = 0, self.count
+        while low < high:       # first entry with this key or a bigger one
+            middle = (low + high) // 2
+            if KEY.unpack_from(data, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        found = []
+        while low < self.count:
+            entry_key, move, weight, learn = ENTRY.unpack_from(data, low * ENTRY.size)
+            if entry_key != key:
+                break
+            found.append((move, weight))
+            low += 1
+        return found
+
+    # book moves that are legal on board, so a key collision can never play a bad move
+    def moves(self, board):
+        entries = self.entries(board.zobrist_key)
+        if not entries:
+            return []
+        legal = set(board.legal_moves())
+        return [(move, weight) for move, weight in entries if move in legal and weight]
+
+    # pick a book move with a chance in proportion to its weight, None when out of book
+    def choose(self, board, rng = random):
+        moves = self.moves(board)
+        if not moves:
+            return None
+        pick = rng.randrange(sum(weight for move, weight in moves))
+        for move, weight in moves:
+            pick -= weight
+            if pick < 0:
+                return move
+
+    def close(self):
+        if self.data:
+            self.data.close()
+        self.file.close()
+
+
+# count every move played in the first plies of the games, weighted by how the game went for the mover
+def collect_moves(pgn_paths, plies = 20, counts = None):
+    counts = {} if counts is None else counts     # (key, move) -> [weight, games]
+    games = errors = 0
+    for path in pgn_paths:
+        with open(path, encoding = "utf-8", errors = "replace") as file:
+            for headers, moves in read_games(file):
+                result = headers.get("Result")
+                board = Board()
+                try:
+                    for san in moves[:plies]:
+                        move = parse_san(board, san)
+                        if result == "1/2-1/2":
+                            weight = DRAW_WEIGHT
+                        elif result == ("1-0" if board.turn == "White" else "0-1"):
+                            weight = WIN_WEIGHT
+                        else:
+                            weight = LOSS_WEIGHT
+                        entry = counts.setdefault((board.zobrist_key, move), [0, 0])
+                        entry[0] += weight
+                        entry[1] += 1
+                        board.make_move(move)
+                except ValueError:
+                    errors += 1     # the moves up to the bad one are still counted
+                games += 1
+    return counts, games, errors
+
+# write the counted moves as a sorted book file
+def write_book(counts, out_path, min_games = 1):
+    by_key = {}
+    for (key, move), (weight, games) in counts.items():
+        if games >= min_games and weight:
+            by_key.setdefault(key, []).append((move, weight))
+
+    entries = []
+    for key, moves in by_key.items():
+        heaviest = max(weight for move, weight in moves)
+        scale = MAX_WEIGHT / heaviest if heaviest > MAX_WEIGHT else 1
+        for move, weight in moves:
+            entries.append((key, move, max(1, int(weight * scale))))
+    entries.sort(key = lambda entry: (entry[0], -entry[2]))    # heaviest move first within a key
+
+    with open(out_path, "wb") as file:
+        for key, move, weight in entries:
+            file.write(ENTRY.pack(key, move, weight, 0))
+    return len(entries)
+
+def build_book(pgn_paths, out_path, plies = 20, min_games = 1):
+    counts, games, errors = collect_moves(pgn_paths, plies)
+    entries = write_book(counts, out_path, min_games)
+    return games, errors, entries
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "build or look into an opening book")
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    build = commands.add_parser("build", help = "compile a book from PGN files")
+    build.add_argument("pgn", nargs = "+")
+    build.add_argument("-o", "--output", default = "book.bin")
+    build.add_argument("--plies", type = int, default = 20, help = "how many moves of each game go in the book")
+    build.add_argument("--min-games", type = int, default = 1, help = "leave out moves played in fewer games")
+
+    probe = commands.add_parser("probe", help = "list the book moves for a position")
+    probe.add_argument("book")
+    probe.add_argument("--fen", help = "position to look up, the start position by default")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        games, errors, entries = build_book(args.pgn, args.output, args.plies, args.min_games)
+        print("%d games (%d with bad moves), %d book entries written to %s" % (games, errors, entries, args.output))
+    else:
+        board = Board()
+        if args.fen:
+            board.set_fen(args.fen)
+        book = OpeningBook(args.book)
+        for move, weight in sorted(book.moves(board), key = lambda entry: -entry[1]):
+            print("%s %d" % (move_name(move), weight))
+        book.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# lazy smp, several processes search the same position at once and share one transposition table
+# the table lives in multiprocessing shared memory, its entries are stored as (key ^ data, data) so a half
+# written entry from another process fails the key check and no locks are needed
+# helpers start one ply deeper on every other process so they fill the table ahead of each other,
+# the move played comes from the process that finished the deepest search
+# it can stand in for a Search (ai_algorithm.py): think takes the same progress and stop arguments, and stop()
+# and a deadline set from another thread are passed on to the processes
+#
+# benchmark: python parallel_search.py [--time 2] [--workers 1 2 4 8] [--json results.json]
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+from queue import Empty
+
+from ai_algorithm import Search, TABLE_SIZE_MB, TIME_LIMIT, MAX_DEPTH
+from board import Board
+from transposition import TranspositionTable, bucket_count, BUCKET_BYTES
+
+# start depth for each helper, repeating
+HELPER_START_DEPTHS = [1, 2]
+POLL_INTERVAL = 0.02    # seconds between checks of the deadline and stop requests while the processes search
+
+# processes are never forked straight from the caller, which may be the game with its window and threads open.
+# a fork server (started once, then forked from) is cheap per search, spawn is the fallback where there is none
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# positions for the benchmark
+BENCHMARK_FENS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+]
+
+
+# search run by each process, the main search (index 0) reports every depth it finishes and every
+# process puts its result on the queue, halt is set by the parent to stop them all
+def _worker(index, board, table_name, table_size_mb, age, max_depth, time_limit, node_limit, halt, messages):
+    memory = shared_memory.SharedMemory(name = table_name)
+    try:
+        table = TranspositionTable(table_size_mb, buffer = memory.buf)
+        table.age = (age - 1) & 63      # think() moves it on by one, to the age the parent picked for everyone
+        search = Search(table = table)
+        start_depth = HELPER_START_DEPTHS[index % len(HELPER_START_DEPTHS)]
+
+        def progress(depth, score, move, nodes):
+            messages.put(("progress", depth, score, move, nodes))
+
+        move = search.think(board, max_depth, time_limit, node_limit, progress if index == 0 else None,
+                            start_depth, stop = halt)
+        messages.put(("done", index, search.completed_depth, search.score, move, search.nodes))
+        del table, search       # the views into the shared memory have to go before it can be closed
+    finally:
+        memory.close()
+
+
+class ParallelSearch:
+    def __init__(self, workers = None, table_size_mb = TABLE_SIZE_MB):
+        self.workers = workers or os.cpu_count()
+        self.table_size_mb = table_size_mb
+        self.context = multiprocessing.get_context(START_METHOD)
+        if START_METHOD == "forkserver":
+            self.context.set_forkserver_preload(["parallel_search"])    # so each search doesnt import it again
+        self.memory = shared_memory.SharedMemory(create = True, size = bucket_count(table_size_mb) * BUCKET_BYTES)
+        self.table = TranspositionTable(table_size_mb, buffer = self.memory.buf)    # to look moves up afterwards
+        self.age = 0
+        self.results = []
+        self.deadline = None
+        self.stop_requested = False     # set from another thread to end the search early
+
+        # the same statistics a single Search keeps
+        self.completed_depth = 0
+        self.score = 0
+        self.best_move = None
+        self.nodes = 0
+        self.elapsed = 0.0
+
+    # same call as Search.think, returns the move of the deepest finished search
+    # progress gets the depths finished by the main search
+    def think(self, board, max_depth, time_limit = None, node_limit = None, progress = None, stop = None):
+        self.stop_requested = False
+        self.age = (self.age + 1) & 63
+        start = time.perf_counter()
+        if time_limit:      # without a time limit a deadline set from another thread (a ponder hit) is kept
+            self.deadline = start + time_limit
+        halt = self.context.Event()
+        messages = self.context.Queue()
+        processes = []
+        for index in range(self.workers):
+            process = self.context.Process(target = _worker, daemon = True,
+                                              args = (index, board, self.memory.name, self.table_size_mb, self.age,
+                                                      max_depth, time_limit, node_limit, halt, messages))
+            process.start()
+            processes.append(process)
+
+        self.results = []
+        failed = set()      # processes that ended without a result, a crash in one mustnt leave us waiting forever
+        while len(self.results) + len(failed) < len(processes):
+            ended = [index for index, process in enumerate(processes) if process.exitcode is not None]
+            try:
+                message = messages.get(timeout = POLL_INTERVAL)
+                if message[0] == "progress":
+                    if progress:
+                        progress(*message[1:])
+                else:
+                    self.results.append(message[1:])
+            except Empty:
+                # anything a process sent before it ended would have been read by now
+                reported = {result[0] for result in self.results}
+                failed.update(index for index in ended if index not in reported)
+            # the processes only know their own time limit, anything else has to reach them through halt
+            if self.stop_requested or (stop is not None and stop.is_set()) or (self.deadline and time.perf_counter() >= self.deadline):
+                halt.set()
+
+        for process in processes:
+            process.join()
+        self.elapsed = time.perf_counter() - start
+        self.deadline = None
+
+        if not self.results:    # every process failed, still play something legal
+            move = next(iter(board.legal_moves()), None)
+            self.completed_depth, self.score, self.best_move, self.nodes = 0, 0, move, 0
+            return move
+
+        # deepest search wins, between equal depths the main search (index 0) comes first
+        index, depth, score, move, nodes = max(self.results, key = lambda result: (result[1], -result[0]))
+        self.completed_depth = depth
+        self.score = score
+        self.best_move = move
+        self.nodes = sum(result[4] for result in self.results)
+        return move
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "depth": self.completed_depth,
+            "score": self.score,
+            "nodes": self.nodes,
+            "time": round(self.elapsed, 3),
+            "nps": int(self.nodes / self.elapsed) if self.elapsed else 0,
+            "worker_depths": [result[1] for result in sorted(self.results)],
+        }
+
+    # ask a running search to stop, it returns the best move found so far
+    def stop(self):
+        self.stop_requested = True
+
+    # give the shared memory back, the search cant be used afterwards
+    def close(self):
+        self.table = None       # its view into the shared memory has to go before it can be closed
+        self.memory.close()
+        self.memory.unlink()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+# search the benchmark positions with more and more processes for the same time
+def benchmark(worker_counts, time_limit):
+    curve = []
+    for workers in worker_counts:
+        search = ParallelSearch(workers)
+        runs = []
+        for fen in BENCHMARK_FENS:
+            board = Board()
+            board.set_fen(fen)
+            search.think(board, MAX_DEPTH, time_limit)
+            runs.append(search.stats())
+        search.close()
+
+        depth = sum(run["depth"] for run in runs) / len(runs)
+        nps = sum(run["nps"] for run in runs) // len(runs)
+        curve.append({"workers": workers, "depth": depth, "nps": nps, "runs": runs})
+
+    for point in curve:
+        point["depth_gain"] = round(point["depth"] - curve[0]["depth"], 2)
+        point["nps_speedup"] = round(point["nps"] / curve[0]["nps"], 2) if curve[0]["nps"] else 0
+    return curve
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "measure how the parallel search scales with more processes")
+    parser.add_argument("--time", type = float, default = TIME_LIMIT * 2, help = "seconds per position")
+    parser.add_argument("--workers", type = int, nargs = "+", help = "process counts to try, default 1 2 4 ... up to the cpu count")
+    parser.add_argument("--json", help = "save the results to this file")
+    args = parser.parse_args(argv)
+
+    worker_counts = args.workers
+    if not worker_counts:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= os.cpu_count():
+            worker_counts.append(worker_counts[-1] * 2)
+
+    curve = benchmark(worker_counts, args.time)
+    print("workers  avg depth  depth gain      nps  speedup")
+    for point in curve:
+        print("%7d  %9.2f  %10.2f  %7d  %6.2fx" % (point["workers"], point["depth"], point["depth_gain"], point["nps"], point["nps_speedup"]))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"time": args.time, "curve": curve}, file, indent = 2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
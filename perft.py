@@ -0,0 +1,149 @@
+# perft, counts every position reachable in exactly n moves to check the move generator and time it
+# usage: python perft.py [depth] [--fen FEN] [--divide] [--json results.json] [--compare old.json]
+#
+# the standard positions below have well known node counts, so any difference means a rules bug
+
+import argparse
+import json
+import sys
+import time
+
+from board import Board
+from bitboard import move_name
+from position import Position
+
+# name, fen and the known node counts for depth 1, 2, 3...
+POSITIONS = [
+    ("start", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",     # castling, pins
+     [48, 2039, 97862, 4085603]),
+    ("endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",      # en passant discovered checks
+     [14, 191, 2812, 43238, 674624]),
+    ("promotions", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333]),
+    ("checks", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487]),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594]),
+]
+
+DEFAULT_DEPTH = 3
+
+
+# number of leaf positions depth moves ahead
+def perft(board, depth):
+    if depth == 0:
+        return 1
+    moves = list(board.legal_moves())
+    if depth == 1:
+        return len(moves)   # the leaves dont need to be played
+    nodes = 0
+    for move in moves:
+        board.make_move(move)
+        nodes += perft(board, depth - 1)
+        board.unmake_move()
+    return nodes
+
+# perft split up by the first move, for finding which move a wrong count comes from
+def divide(board, depth):
+    counts = {}
+    for move in list(board.legal_moves()):
+        board.make_move(move)
+        counts[move_name(move)] = perft(board, depth - 1)
+        board.unmake_move()
+    return counts
+
+def run_position(board, name, fen, depth, expected = None, show_divide = False):
+    board.set_fen(fen)
+    start = time.perf_counter()
+    if show_divide:
+        counts = divide(board, depth)
+        nodes = sum(counts.values())
+    else:
+        counts = None
+        nodes = perft(board, depth)
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "name": name,
+        "fen": fen,
+        "depth": depth,
+        "nodes": nodes,
+        "expected": expected,
+        "ok": expected is None or nodes == expected,
+        "time": round(elapsed, 4),
+        "nps": int(nodes / elapsed) if elapsed else 0,
+    }
+    if counts is not None:
+        result["divide"] = counts
+    return result
+
+def print_result(result):
+    status = "" if result["expected"] is None else ("ok" if result["ok"] else "WRONG, expected %d" % result["expected"])
+    print("%-12s depth %d  %10d nodes  %8.3fs  %8d nps  %s"
+          % (result["name"], result["depth"], result["nodes"], result["time"], result["nps"], status))
+    for move, count in sorted(result.get("divide", {}).items()):
+        print("    %s: %d" % (move, count))
+
+# nodes per second against an earlier run saved with --json
+def print_comparison(results, old_path):
+    with open(old_path) as file:
+        old = {(r["name"], r["depth"]): r for r in json.load(file)["positions"]}
+    for result in results:
+        before = old.get((result["name"], result["depth"]))
+        if before and before["nps"]:
+            print("%-12s %8d -> %8d nps  (%.2fx)" % (result["name"], before["nps"], result["nps"], result["nps"] / before["nps"]))
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "count move generator leaf nodes and time them")
+    parser.add_argument("depth", type = int, nargs = "?", default = DEFAULT_DEPTH)
+    parser.add_argument("--fen", help = "run one position instead of the standard set")
+    parser.add_argument("--divide", action = "store_true", help = "show the count below each first move")
+    parser.add_argument("--json", help = "save the results to this file")
+    parser.add_argument("--compare", help = "compare nodes per second with results saved earlier")
+    args = parser.parse_args(argv)
+    if args.depth < 1:
+        parser.error("depth has to be at least 1")
+
+    board = Board()
+
+    if args.fen:
+        try:
+            Position.from_fen(args.fen)
+        except ValueError as problem:
+            parser.error(str(problem))
+        positions = [("fen", args.fen, [])]
+    else:
+        positions = POSITIONS
+
+    results = []
+    for name, fen, counts in positions:
+        expected = counts[args.depth - 1] if 1 <= args.depth <= len(counts) else None
+        result = run_position(board, name, fen, args.depth, expected, args.divide)
+        print_result(result)
+        results.append(result)
+
+    total_nodes = sum(r["nodes"] for r in results)
+    total_time = sum(r["time"] for r in results)
+    summary = {
+        "depth": args.depth,
+        "nodes": total_nodes,
+        "time": round(total_time, 4),
+        "nps": int(total_nodes / total_time) if total_time else 0,
+        "ok": all(r["ok"] for r in results),
+        "positions": results,
+    }
+    print("total %d nodes in %.3fs, %d nps" % (total_nodes, total_time, summary["nps"]))
+
+    if args.compare:
+        print_comparison(results, args.compare)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(summary, file, indent = 2)
+
+    return 0 if summary["ok"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
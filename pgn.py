@@ -0,0 +1,110 @@
+# reading games in PGN, the usual text format for chess games
+# games are read one at a time from the file so a big collection never has to fit in memory,
+# and SAN moves (like Nf3, exd5, O-O, e8=Q) are turned into packed moves using the board's legal moves
+
+import re
+from bitboard import (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, FILES, square, iter_squares, encode_move, parse_square,
+                      other_side)
+
+SAN_PIECES = {"N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN, "K": KING}
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+HEADER = re.compile(r'\[(\w+)\s+"(.*)"\]')
+TOKEN = re.compile(r'\{[^}]*\}|;[^\n]*|1-0|0-1|1/2-1/2|\*|\d+\.+|\$\d+|\(|\)|[^\s(){};]+')
+SAN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?$')
+
+
+# go through a PGN file one game at a time, yields (headers, san moves)
+# the result is in headers["Result"], taken from the end of the moves when there is no header for it
+def read_games(file):
+    headers = {}
+    movetext = []
+    for line in file:
+        line = line.strip()
+        header = HEADER.match(line)
+        if header:
+            if movetext:    # a header after moves starts the next game
+                yield finish_game(headers, movetext)
+                headers, movetext = {}, []
+            headers[header.group(1)] = header.group(2)
+        elif line:
+            movetext.append(line)
+            if line.split()[-1] in RESULTS and not line.startswith(";"):   # the result token ends the game
+                yield finish_game(headers, movetext)
+                headers, movetext = {}, []
+    if headers or movetext:
+        yield finish_game(headers, movetext)
+
+def finish_game(headers, movetext):
+    moves, result = parse_movetext("\n".join(movetext))
+    if result and "Result" not in headers:
+        headers["Result"] = result
+    return headers, moves
+
+# the main line of a game's moves, skipping comments, variations, move numbers and annotations
+def parse_movetext(text):
+    moves = []
+    result = None
+    variation_depth = 0
+    for token in TOKEN.findall(text):
+        if token == "(":
+            variation_depth += 1
+        elif token == ")":
+            variation_depth -= 1
+        elif variation_depth or token[0] in "{;$" or token[0].isdigit() and token.endswith("."):
+            continue
+        elif token in RESULTS:
+            result = token
+        else:
+            moves.append(token)
+    return moves, result
+
+
+# the legal move on board written as san, raises ValueError when there is no such move or more than one
+# only the pieces of the kind named are tried, and only against the one target tile
+def parse_san(board, san):
+    text = san.rstrip("+#!?")
+    side = board.turn
+    info = board.check_info(side)
+
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        king = board.white_king if side == "White" else board.black_king
+        from_sq = square(king.row, king.column)
+        to_sq = from_sq + (2 if len(text) == 3 else -2)
+        matches = []
+        if board.legal_mask(king, None, info) >> to_sq & 1:
+            matches.append(encode_move(from_sq, to_sq))
+    else:
+        parts = SAN.match(text)
+        if not parts:
+            raise ValueError("cant read move %r" % san)
+        piece, from_file, from_rank, capture, target, promotion = parts.groups()
+        kind = SAN_PIECES[piece] if piece else PAWN
+        to_sq = parse_square(target)
+        promotion = SAN_PIECES[promotion] if promotion else 0
+        if (kind == PAWN and (to_sq < 8 or to_sq >= 56)) != bool(promotion):
+            raise ValueError("illegal move %r in %s" % (san, side))    # a pawn promotes exactly when it reaches the last row
+
+        # the x has to match the board, a pawn capture names the file it comes from and a pawn push stays on its file
+        en_passant = kind == PAWN and board.en_passant_target is not None and square(*board.en_passant_target) == to_sq
+        takes = bool(board.occupied[other_side(side)] >> to_sq & 1) or en_passant
+        if bool(capture) != takes:
+            raise ValueError("%s %r in %s" % ("capture without an x" if takes else "x on a move that takes nothing", san, side))
+        if kind == PAWN:
+            if capture and not from_file:
+                raise ValueError("pawn capture %r doesnt say which file it comes from, in %s" % (san, side))
+            if not capture:
+                from_file = target[0]
+
+        matches = []
+        for from_sq in iter_squares(board.pieces[side][kind]):
+            if from_file and FILES[from_sq & 7] != from_file:
+                continue
+            if from_rank and str(8 - (from_sq >> 3)) != from_rank:
+                continue
+            if board.legal_mask(board.squares[from_sq], board.en_passant_target, info) >> to_sq & 1:
+                matches.append(encode_move(from_sq, to_sq, promotion))
+
+    if len(matches) != 1:
+        raise ValueError("%s move %r in %s" % ("ambiguous" if matches else "illegal", san, side))
+    return matches[0]
@@ -0,0 +1,124 @@
+# replay a PGN collection through the rules engine to check it and index it
+# games are read one at a time (pgn.read_games) and handed out in batches to a pool of processes, only a few
+# batches are ever waiting at once so memory stays the same however big the file is. one JSON line is written
+# per game, in file order, as soon as its batch comes back:
+#   {"game": 12, "white": ..., "black": ..., "result": "1-0", "plies": 57, "fen": "...", "error": null}
+# fen is the position after the last legal move, error says which move was illegal or unreadable
+#
+# python pgn_replay.py games.pgn [more.pgn ...] -o results.jsonl [--workers 4] [--batch 200]
+
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from board import Board
+from pgn import read_games, parse_san
+
+BATCH_SIZE = 200
+BATCHES_PER_WORKER = 2      # batches queued up for each process, more keeps them busier but uses more memory
+REPORT_EVERY = 10000        # games between progress lines
+
+
+# play one game's moves, stops at the first move that isnt legal
+def replay_game(number, headers, moves):
+    board = Board()
+    error = None
+    plies = 0
+    for san in moves:
+        try:
+            move = parse_san(board, san)
+        except ValueError as problem:
+            error = "ply %d: %s" % (plies + 1, problem)
+            break
+        board.make_move(move)
+        plies += 1
+    return {
+        "game": number,
+        "white": headers.get("White"),
+        "black": headers.get("Black"),
+        "result": headers.get("Result"),
+        "plies": plies,
+        "fen": board.fen(),
+        "error": error,
+    }
+
+# run by the pool, a batch is a list of (number, headers, moves)
+def replay_batch(batch):
+    return [replay_game(number, headers, moves) for number, headers, moves in batch]
+
+# numbered games from every file, grouped into lists of batch_size
+def read_batches(pgn_paths, batch_size = BATCH_SIZE):
+    batch = []
+    number = 0
+    for path in pgn_paths:
+        with open(path, encoding = "utf-8", errors = "replace") as file:
+            for headers, moves in read_games(file):
+                number += 1
+                batch.append((number, headers, moves))
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+# replay every game and write the results to out (a file), returns (games, games with errors, seconds)
+# progress(games, errors, seconds) is called every REPORT_EVERY games
+def replay_files(pgn_paths, out, workers = None, batch_size = BATCH_SIZE, progress = None):
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    games = errors = 0
+    next_report = REPORT_EVERY
+
+    def write(results):
+        nonlocal games, errors, next_report
+        for result in results:
+            out.write(json.dumps(result) + "\n")
+            games += 1
+            errors += result["error"] is not None
+        if progress and games >= next_report:
+            progress(games, errors, time.perf_counter() - start)
+            next_report += REPORT_EVERY
+
+    if workers <= 1:
+        for batch in read_batches(pgn_paths, batch_size):
+            write(replay_batch(batch))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            pending = collections.deque()       # results come back in the order the batches went out
+            for batch in read_batches(pgn_paths, batch_size):
+                pending.append(pool.apply_async(replay_batch, (batch,)))
+                if len(pending) >= workers * BATCHES_PER_WORKER:
+                    write(pending.popleft().get())
+            while pending:
+                write(pending.popleft().get())
+
+    return games, errors, time.perf_counter() - start
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "check every move of PGN games against the rules and save where each game ends")
+    parser.add_argument("pgn", nargs = "+")
+    parser.add_argument("-o", "--output", default = "-", help = "JSON lines file for the results, - for standard output")
+    parser.add_argument("--workers", type = int, help = "processes to use, the cpu count by default")
+    parser.add_argument("--batch", type = int, default = BATCH_SIZE, help = "games sent to a process at a time")
+    args = parser.parse_args(argv)
+
+    def report(games, errors, seconds):
+        print("%d games, %d with errors, %.0f games/s" % (games, errors, games / seconds if seconds else 0), file = sys.stderr)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        games, errors, seconds = replay_files(args.pgn, out, args.workers, args.batch, report)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    report(games, errors, seconds)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
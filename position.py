@@ -0,0 +1,144 @@
+from bitboard import (WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE, FILES, square_name, parse_square)
+
+# a position as a small value that never changes, for passing between processes, using as a dict key
+# or saving, without the piece objects and attack maps a live Board carries
+# the board is 64 bytes in square order (A8 first, the same order as a FEN), one FEN letter per piece
+# and "." for an empty tile, white pieces in upper case
+
+PIECE_LETTERS = "pnbrqk"        # by piece kind
+EMPTY_SQUARE = ord(".")
+CASTLING_LETTERS = [("K", WHITE_KINGSIDE), ("Q", WHITE_QUEENSIDE), ("k", BLACK_KINGSIDE), ("q", BLACK_QUEENSIDE)]
+# where the king and rook have to stand for each castling right: (king, king square, rook, rook square)
+CASTLING_HOMES = {WHITE_KINGSIDE: ("K", 60, "R", 63), WHITE_QUEENSIDE: ("K", 60, "R", 56),
+                  BLACK_KINGSIDE: ("k", 4, "r", 7), BLACK_QUEENSIDE: ("k", 4, "r", 0)}
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+class Position:
+    __slots__ = ("board", "turn", "castling_rights", "en_passant", "halfmove_clock", "fullmove_number")
+
+    def __init__(self, board, turn = "White", castling_rights = 0, en_passant = None, halfmove_clock = 0, fullmove_number = 1):
+        if len(board) != 64:
+            raise ValueError("a position needs 64 squares, got %d" % len(board))
+        set_field = object.__setattr__
+        set_field(self, "board", bytes(board))
+        set_field(self, "turn", turn)
+        set_field(self, "castling_rights", castling_rights)
+        set_field(self, "en_passant", en_passant)        # square a pawn can capture onto, or None
+        set_field(self, "halfmove_clock", halfmove_clock)
+        set_field(self, "fullmove_number", fullmove_number)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Position can't be changed, make a new one")
+
+    def fields(self):
+        return (self.board, self.turn, self.castling_rights, self.en_passant, self.halfmove_clock, self.fullmove_number)
+
+    def __eq__(self, other):
+        return isinstance(other, Position) and self.fields() == other.fields()
+
+    def __hash__(self):
+        return hash(self.fields())
+
+    # nothing in it can change, so a copy is the same object
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return Position, self.fields()
+
+    def __repr__(self):
+        return "Position(%r)" % self.fen()
+
+    # (side, kind) of the piece on a square, or None
+    def piece_at(self, sq):
+        letter = self.board[sq]
+        if letter == EMPTY_SQUARE:
+            return None
+        letter = chr(letter)
+        return ("White" if letter.isupper() else "Black"), PIECE_LETTERS.index(letter.lower())
+
+    @classmethod
+    def from_fen(cls, fen):
+        fields = fen.split()
+        if len(fields) < 2:
+            raise ValueError("FEN needs at least the pieces and the side to move: %r" % fen)
+        rows = fields[0].split("/")
+        if len(rows) != 8:
+            raise ValueError("FEN needs 8 rows: %r" % fen)
+
+        board = bytearray()
+        for rank in rows:
+            start = len(board)
+            for letter in rank:
+                if letter in "12345678":
+                    board += b"." * int(letter)
+                elif letter.lower() in PIECE_LETTERS:
+                    board.append(ord(letter))
+                else:
+                    raise ValueError("unknown piece %r in FEN %r" % (letter, fen))
+            if len(board) - start != 8:
+                raise ValueError("FEN row %r isnt 8 squares: %r" % (rank, fen))
+        if board.count(b"K") != 1 or board.count(b"k") != 1:
+            raise ValueError("FEN needs one king for each side: %r" % fen)
+
+        if fields[1] not in ("w", "b"):
+            raise ValueError("side to move has to be w or b: %r" % fen)
+        turn = "White" if fields[1] == "w" else "Black"
+
+        # a right is only kept while its king and rook are still at home, the move generator relies on it
+        castling_rights = 0
+        for letter, right in CASTLING_LETTERS:
+            king, king_sq, rook, rook_sq = CASTLING_HOMES[right]
+            if (letter in (fields[2] if len(fields) > 2 else "-")
+                    and board[king_sq] == ord(king) and board[rook_sq] == ord(rook)):
+                castling_rights |= right
+        # the en passant square is behind a pawn that just moved two, so on the sixth row when white moves
+        en_passant = fields[3] if len(fields) > 3 else "-"
+        if en_passant != "-" and (len(en_passant) != 2 or en_passant[0] not in FILES
+                                  or en_passant[1] != ("6" if turn == "White" else "3")):
+            raise ValueError("bad en passant square %r in FEN %r" % (en_passant, fen))
+
+        return cls(board,
+                   turn,
+                   castling_rights,
+                   None if en_passant == "-" else parse_square(en_passant),
+                   int(fields[4]) if len(fields) > 4 else 0,
+                   int(fields[5]) if len(fields) > 5 else 1)
+
+    def fen(self):
+        rows = []
+        for row in range(8):
+            text = ""
+            empty = 0
+            for letter in self.board[row * 8:row * 8 + 8]:
+                if letter == EMPTY_SQUARE:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                text += chr(letter)
+            rows.append(text + (str(empty) if empty else ""))
+
+        castling = "".join(letter for letter, right in CASTLING_LETTERS if self.castling_rights & right) or "-"
+        en_passant = square_name(self.en_passant) if self.en_passant is not None else "-"
+        return "%s %s %s %s %d %d" % ("/".join(rows), "w" if self.turn == "White" else "b", castling, en_passant,
+                                      self.halfmove_clock, self.fullmove_number)
+
+    # 71 bytes: the board, side, castling, en passant (64 for none), two byte halfmove clock and move number
+    def to_bytes(self):
+        return (self.board + bytes([0 if self.turn == "White" else 1, self.castling_rights,
+                                    64 if self.en_passant is None else self.en_passant])
+                + self.halfmove_clock.to_bytes(2, "big") + self.fullmove_number.to_bytes(2, "big"))
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data[:64], "White" if data[64] == 0 else "Black", data[65], None if data[66] == 64 else data[66],
+                   int.from_bytes(data[67:69], "big"), int.from_bytes(data[69:71], "big"))
+
+
+START_POSITION = Position.from_fen(START_FEN)
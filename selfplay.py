@@ -0,0 +1,203 @@
+# headless ai against ai matches, to find out whether a change to the search or evaluation makes it stronger
+# two engine settings (A and B) play each other from the same openings with the colours swapped, the games
+# are spread over a pool of processes and every finished game is written as one JSON line straight away.
+# at the end the Elo difference of A over B is given with a 95% error bar
+#
+# python selfplay.py --games 200 --a time=0.1 --b time=0.1,ordering=0 [--workers 4] [-o selfplay.jsonl]
+#
+# engine settings are comma separated key=value pairs, anything left out uses ENGINE_DEFAULTS:
+#   time      seconds per move
+#   depth     deepest search
+#   nodes     nodes per move, 0 for no limit
+#   table     transposition table size in MB
+#   ordering  1 or 0, move ordering on or off
+#   book      1 or 0, play from the opening book (book.bin) when there is one
+#
+# openings are random moves from the start (--opening-plies, the same with the same --seed) or the FENs in
+# an --openings file, one per line
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import ai_algorithm
+from ai_algorithm import Search, MAX_DEPTH
+from bitboard import move_name
+from board import Board
+from game import Game
+
+ENGINE_DEFAULTS = {"time": 0.1, "depth": MAX_DEPTH, "nodes": 0, "table": 16, "ordering": 1, "book": 1}
+OPENING_PLIES = 4
+MAX_PLIES = 300         # a game this long is called a draw
+RESULT_SCORES = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+
+
+# "time=0.1,depth=6" -> settings dict
+def parse_engine(text):
+    engine = dict(ENGINE_DEFAULTS)
+    for item in filter(None, text.split(",")):
+        key, _, value = item.partition("=")
+        if key not in engine:
+            raise ValueError("unknown engine setting %r, use one of %s" % (key, ", ".join(ENGINE_DEFAULTS)))
+        engine[key] = float(value) if key == "time" else int(value)
+    return engine
+
+# FENs to start from, each one is played twice
+def make_openings(count, plies = OPENING_PLIES, seed = 0, path = None):
+    if path:
+        with open(path) as file:
+            fens = [line.strip() for line in file if line.strip()]
+        return [fens[i % len(fens)] for i in range(count)]
+
+    rng = random.Random(seed)
+    openings = []
+    while len(openings) < count:
+        board = Board()
+        for _ in range(plies):
+            moves = list(board.legal_moves())
+            if not moves:
+                break
+            board.make_move(rng.choice(moves))
+        if any(True for _ in board.legal_moves()):      # the game has to be able to go on
+            openings.append(board.fen())
+    return openings
+
+
+# searches are made once per process and engine setting, then kept for the following games
+_searches = {}
+
+def _search_for(engine):
+    key = (engine["table"], engine["ordering"])
+    if key not in _searches:
+        _searches[key] = Search(engine["table"])
+        _searches[key].use_ordering = bool(engine["ordering"])
+    return _searches[key]
+
+def choose_move(board, engine):
+    if engine["book"]:
+        move = ai_algorithm.book_move(board)
+        if move:
+            return move
+    search = _search_for(engine)
+    return search.think(board, engine["depth"], engine["time"], engine["nodes"] or None)
+
+# play one game, job is (number, opening fen, white engine, black engine, whether A has white)
+# returns the JSON record of the game
+def play_game(job):
+    number, fen, white, black, a_white = job
+    start = time.perf_counter()
+    game = Game()
+    game.board.set_fen(fen)
+    for search in _searches.values():
+        search.clear()      # nothing learned in the last game carries over
+    moves = []
+
+    while not game.is_over and len(moves) < MAX_PLIES:
+        move = choose_move(game.board, white if game.turn == "White" else black)
+        moves.append(move_name(move))
+        game.play_move(move)
+
+    if game.winner == "White":
+        result = "1-0"
+    elif game.winner == "Black":
+        result = "0-1"
+    else:
+        result = "1/2-1/2"
+    reason = game.result[1] if game.result else "move limit"
+
+    return {
+        "game": number,
+        "white": "A" if a_white else "B",
+        "black": "B" if a_white else "A",
+        "opening": fen,
+        "result": result,
+        "reason": reason,
+        "plies": len(moves),
+        "moves": " ".join(moves),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+# points scored by engine A in a game record
+def a_score(record):
+    score = RESULT_SCORES[record["result"]]
+    return score if record["white"] == "A" else 1.0 - score
+
+
+def elo_from_score(score):
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+# Elo difference of A over B and the half width of its 95% interval, from A's score in each game
+def elo_difference(scores):
+    games = len(scores)
+    if not games:
+        return 0.0, math.inf
+    mean = sum(scores) / games
+    deviation = math.sqrt(sum((score - mean) ** 2 for score in scores) / games / games)
+    if not deviation:       # every game scored the same, nothing to say how sure that is yet
+        return elo_from_score(mean), math.inf
+    low, high = elo_from_score(mean - 1.96 * deviation), elo_from_score(mean + 1.96 * deviation)
+    return elo_from_score(mean), (high - low) / 2
+
+def summary(scores):
+    wins = scores.count(1.0)
+    losses = scores.count(0.0)
+    elo, margin = elo_difference(scores)
+    return "%d games  A +%d =%d -%d  Elo %+.1f +/- %.1f" % (len(scores), wins, len(scores) - wins - losses, losses, elo, margin)
+
+
+# play the match and write every game to out, returns A's score in each game
+def run_match(engine_a, engine_b, games, out, workers = None, openings = None, progress = None):
+    workers = workers or os.cpu_count()
+    openings = openings or make_openings((games + 1) // 2)
+    jobs = []
+    for number in range(games):
+        a_white = number % 2 == 0       # every opening once with each colour
+        white, black = (engine_a, engine_b) if a_white else (engine_b, engine_a)
+        jobs.append((number + 1, openings[number // 2], white, black, a_white))
+
+    scores = []
+    with multiprocessing.Pool(workers) as pool:
+        for record in pool.imap_unordered(play_game, jobs):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            scores.append(a_score(record))
+            if progress:
+                progress(scores)
+    return scores
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "play two ai settings against each other and measure the Elo difference")
+    parser.add_argument("--a", default = "", help = "settings of engine A, like time=0.1,depth=6")
+    parser.add_argument("--b", default = "", help = "settings of engine B")
+    parser.add_argument("--games", type = int, default = 100)
+    parser.add_argument("--workers", type = int, help = "processes to use, the cpu count by default")
+    parser.add_argument("-o", "--output", default = "selfplay.jsonl", help = "JSON lines file for the games")
+    parser.add_argument("--openings", help = "file of FENs to start the games from")
+    parser.add_argument("--opening-plies", type = int, default = OPENING_PLIES, help = "random moves played to make each opening")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args(argv)
+
+    engine_a, engine_b = parse_engine(args.a), parse_engine(args.b)
+    openings = make_openings((args.games + 1) // 2, args.opening_plies, args.seed, args.openings)
+    print("A: %s\nB: %s" % (engine_a, engine_b))
+
+    def report(scores):
+        print(summary(scores), file = sys.stderr)
+
+    with open(args.output, "w") as out:
+        scores = run_match(engine_a, engine_b, args.games, out, args.workers, openings, report)
+    print(summary(scores))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+import pygame
+from bitboard import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, SIDES
+
+# piece images shared by the whole program, each file is read from disk once
+# the cache is keyed by (side, piece kind, size) so a board drawn at another size gets its own scaled copy
+
+PIECE_SIZE = 64     # size of the images in assets, they are drawn at this size unless asked otherwise
+KIND_NAMES = {PAWN: "Pawn", KNIGHT: "Knight", BISHOP: "Bishop", ROOK: "Rook", QUEEN: "Queen", KING: "King"}
+
+_cache = {}
+_files = {}     # unscaled images, so every size only reads the file once too
+
+
+def image_path(side, kind):
+    return "assets/%s %s.png" % (side, KIND_NAMES[kind])
+
+# image of a piece, needs the display to be set up first
+def get(side, kind, size = PIECE_SIZE):
+    key = (side, kind, size)
+    if key not in _cache:
+        path = image_path(side, kind)
+        if path not in _files:
+            _files[path] = pygame.image.load(path).convert_alpha()
+        image = _files[path]
+        if image.get_size() != (size, size):
+            image = pygame.transform.smoothscale(image, (size, size))
+        _cache[key] = image
+    return _cache[key]
+
+# load every piece image at startup so the first frames dont wait on the disk
+def preload(size = PIECE_SIZE):
+    for side in SIDES:
+        for kind in KIND_NAMES:
+            get(side, kind, size)
@@ -0,0 +1,207 @@
+# endgame tablebases for king and one piece against a lone king (KQK, KRK, KPK)
+# every position is solved once by retrograde analysis, working backwards from the checkmates, and the
+# distance to mate is stored as one byte per position. the files are read with mmap so probing costs
+# one byte lookup and nothing is loaded at startup
+#
+# build them with: python tablebase.py build [--dir tablebases]
+#
+# tables are made with white as the side with the extra piece, positions where black has it are looked up
+# upside down with the colours swapped. the index of a position is
+#   (side to move << 18) | (strong king << 12) | (weak king << 6) | piece square
+# with side to move 0 when the strong side moves. a byte of 0 is a draw (or an impossible position),
+# otherwise it is the number of plies until the strong side mates, plus one
+
+import argparse
+import mmap
+import os
+import sys
+import time
+
+from bitboard import (PAWN, ROOK, QUEEN, KING, SIDES, KING_ATTACKS, PAWN_ATTACKS, ROOK_DIRECTIONS,
+                      QUEEN_DIRECTIONS, slider_attacks, lsb, popcount, other_side)
+
+TABLE_DIR = "tablebases"
+TABLES = {"KQK": QUEEN, "KRK": ROOK, "KPK": PAWN}
+BUILD_ORDER = ["KQK", "KRK", "KPK"]     # a pawn promotes into the other two, so they come first
+TABLE_SIZE = 1 << 19
+MAX_PIECES = 3
+
+WIN, DRAW, LOSS = 1, 0, -1
+
+
+def index(strong_to_move, strong_king, weak_king, piece):
+    return ((0 if strong_to_move else 1) << 18) | (strong_king << 12) | (weak_king << 6) | piece
+
+# squares the strong sides piece attacks with the other pieces in the way
+def piece_attacks(kind, sq, occupied):
+    if kind == PAWN:
+        return PAWN_ATTACKS["White"][sq]
+    return slider_attacks(sq, occupied, QUEEN_DIRECTIONS if kind == QUEEN else ROOK_DIRECTIONS)
+
+
+# ---- building ----
+
+def _position_ok(kind, strong_king, weak_king, piece):
+    if strong_king == weak_king or piece == strong_king or piece == weak_king:
+        return False
+    if KING_ATTACKS[strong_king] >> weak_king & 1:
+        return False
+    return kind != PAWN or 8 <= piece < 56       # pawns are never on the first or last row
+
+def _weak_in_check(kind, strong_king, weak_king, piece):
+    occupied = (1 << strong_king) | (1 << weak_king) | (1 << piece)
+    return bool(piece_attacks(kind, piece, occupied) >> weak_king & 1)
+
+# legal moves of the lone king, a capture of the piece counts as a move too
+def _weak_moves(kind, strong_king, weak_king, piece):
+    moves = []
+    for target in _squares(KING_ATTACKS[weak_king] & ~KING_ATTACKS[strong_king] & ~(1 << strong_king)):
+        if target == piece:     # taking the piece, the tiles next to its king are already left out
+            moves.append(target)
+            continue
+        occupied = (1 << strong_king) | (1 << target) | (1 << piece)
+        if not piece_attacks(kind, piece, occupied) >> target & 1:
+            moves.append(target)
+    return moves
+
+def _squares(bb):
+    squares = []
+    while bb:
+        low = bb & -bb
+        squares.append(low.bit_length() - 1)
+        bb ^= low
+    return squares
+
+# solve one table, promotions look their result up in the tables already built
+def build_table(kind, promotion_tables = None):
+    values = bytearray(TABLE_SIZE)
+    remaining = [0] * TABLE_SIZE            # weak side moves not yet known to lose, for weak to move positions
+    buckets = [[] for _ in range(256)]      # positions waiting to be settled, by distance to mate
+
+    for strong_king in range(64):
+        for weak_king in range(64):
+            for piece in range(64):
+                if not _position_ok(kind, strong_king, weak_king, piece):
+                    continue
+                weak_index = index(False, strong_king, weak_king, piece)
+                moves = _weak_moves(kind, strong_king, weak_king, piece)
+                remaining[weak_index] = len(moves)
+                if not moves and _weak_in_check(kind, strong_king, weak_king, piece):
+                    buckets[0].append(weak_index)   # checkmate
+
+                # a pawn on the seventh row can promote, the result comes from the table of the new piece
+                if kind == PAWN and piece < 16 and promotion_tables and not _weak_in_check(kind, strong_king, weak_king, piece):
+                    target = piece - 8
+                    if target != strong_king and target != weak_king:
+                        for table in promotion_tables:
+                            value = table[index(False, strong_king, weak_king, target)]
+                            if value:
+                                buckets[value].append(index(True, strong_king, weak_king, piece))
+
+    for distance in range(255):
+        for position in buckets[distance]:
+            if values[position]:
+                continue
+            values[position] = distance + 1
+            strong_to_move = not position >> 18
+            strong_king, weak_king, piece = (position >> 12) & 63, (position >> 6) & 63, position & 63
+
+            if strong_to_move:
+                # the weak king could have stepped here from any empty neighbouring tile, that move now loses
+                for before in _squares(KING_ATTACKS[weak_king] & ~KING_ATTACKS[strong_king]):
+                    if before == strong_king or before == piece:
+                        continue
+                    parent = index(False, strong_king, before, piece)
+                    remaining[parent] -= 1
+                    if remaining[parent] == 0:
+                        buckets[distance + 1].append(parent)
+            else:
+                # any strong side move that led here wins
+                for parent in _strong_unmoves(kind, strong_king, weak_king, piece):
+                    if not values[parent]:
+                        buckets[distance + 1].append(parent)
+    return values
+
+# strong side to move positions with a move that reaches this one
+def _strong_unmoves(kind, strong_king, weak_king, piece):
+    occupied = (1 << strong_king) | (1 << weak_king) | (1 << piece)
+    parents = []
+
+    for before in _squares(KING_ATTACKS[strong_king] & ~KING_ATTACKS[weak_king] & ~occupied):
+        if not _weak_in_check(kind, before, weak_king, piece):
+            parents.append(index(True, before, weak_king, piece))
+
+    if kind == PAWN:
+        befores = []
+        if piece + 8 < 56 and not occupied >> (piece + 8) & 1:
+            befores.append(piece + 8)
+            if 32 <= piece < 40 and not occupied >> (piece + 16) & 1:   # a double step from the starting row
+                befores.append(piece + 16)
+    else:
+        befores = _squares(piece_attacks(kind, piece, occupied) & ~occupied)     # sliders move the same both ways
+    for before in befores:
+        if not _weak_in_check(kind, strong_king, weak_king, before):
+            parents.append(index(True, strong_king, weak_king, before))
+    return parents
+
+def build_all(directory = TABLE_DIR):
+    os.makedirs(directory, exist_ok = True)
+    built = {}
+    for name in BUILD_ORDER:
+        start = time.perf_counter()
+        promotions = [built[promoted] for promoted in ("KQK", "KRK") if promoted in built] if TABLES[name] == PAWN else None
+        built[name] = build_table(TABLES[name], promotions)
+        with open(os.path.join(directory, name + ".bin"), "wb") as file:
+            file.write(built[name])
+        wins = sum(1 for value in built[name] if value)
+        print("%s: %d won positions, longest mate %d plies, %.1fs" % (name, wins, max(built[name]) - 1, time.perf_counter() - start))
+
+
+# ---- probing ----
+
+_tables = {}
+
+def _table(name):
+    if name not in _tables:
+        path = os.path.join(TABLE_DIR, name + ".bin")
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                _tables[name] = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        else:
+            _tables[name] = None
+    return _tables[name]
+
+# look the board up, returns (WIN, DRAW or LOSS for the side to move, plies until mate) or None when there
+# is no table for the material. a LOSS in 0 plies means the side to move is checkmated
+def probe(board):
+    if popcount(board.all_occupied) != MAX_PIECES:
+        return None
+    for strong in SIDES:
+        pieces = board.pieces[strong]
+        for name, kind in TABLES.items():
+            if pieces[kind]:
+                table = _table(name)
+                if table is None:
+                    return None
+                weak = other_side(strong)
+                strong_king, weak_king, piece = lsb(pieces[KING]), lsb(board.pieces[weak][KING]), lsb(pieces[kind])
+                if strong == "Black":   # turn the board over so the strong side plays up the board like white
+                    strong_king, weak_king, piece = strong_king ^ 56, weak_king ^ 56, piece ^ 56
+                value = table[index(board.turn == strong, strong_king, weak_king, piece)]
+                if not value:
+                    return DRAW, 0
+                return (WIN if board.turn == strong else LOSS), value - 1
+    return None     # a bishop or knight cant mate on its own
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "build endgame tablebases")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    build = commands.add_parser("build", help = "solve and save every table")
+    build.add_argument("--dir", default = TABLE_DIR)
+    args = parser.parse_args(argv)
+    build_all(args.dir)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# fixed size transposition table for the ai search
+# entries live in one preallocated block of 64 bit words so memory use never grows during a search
+#
+# each bucket holds two entries of two words each:
+#   slot 0 is depth-preferred, it keeps the deepest result unless the entry is from an older search
+#   slot 1 is always-replace, it takes whatever slot 0 turns away
+# an entry is stored as (key ^ data, data) so a half written entry fails the key check instead of
+# being trusted, which lets several processes share one table without locks
+
+EXACT, LOWER, UPPER = 0, 1, 2     # bound types: exact score, score is at least, score is at most
+
+ENTRY_WORDS = 2
+BUCKET_WORDS = 2 * ENTRY_WORDS
+BUCKET_BYTES = BUCKET_WORDS * 8
+
+SCORE_OFFSET = 1 << 15      # scores are stored as 16 bit unsigned numbers
+
+
+# pack the stored values into one 64 bit word
+# bits 0-15 move, 16-31 score, 32-39 depth, 40-41 bound, 42-47 age
+def pack(move, score, depth, bound, age):
+    return move | ((score + SCORE_OFFSET) << 16) | (depth << 32) | (bound << 40) | (age << 42)
+
+def unpack(data):
+    move = data & 0xFFFF
+    score = ((data >> 16) & 0xFFFF) - SCORE_OFFSET
+    depth = (data >> 32) & 0xFF
+    bound = (data >> 40) & 3
+    age = (data >> 42) & 63
+    return move, score, depth, bound, age
+
+# number of buckets that fit in size_mb, rounded down to a power of two so a mask can pick the bucket
+def bucket_count(size_mb):
+    count = 1
+    while count * 2 * BUCKET_BYTES <= size_mb * 1024 * 1024:
+        count *= 2
+    return count
+
+
+class TranspositionTable:
+    # buffer can be any writable block of memory (for example shared memory), otherwise one is allocated
+    def __init__(self, size_mb = 16, buffer = None):
+        self.bucket_count = bucket_count(size_mb)
+        self.mask = self.bucket_count - 1
+        if buffer is None:
+            buffer = bytearray(self.bucket_count * BUCKET_BYTES)
+        self.words = memoryview(buffer)[:self.bucket_count * BUCKET_BYTES].cast("Q")
+        self.age = 0
+
+        # counters for the search statistics
+        self.probes = 0
+        self.hits = 0
+
+    # call between moves so entries from older searches are the first to be replaced
+    def new_search(self):
+        self.age = (self.age + 1) & 63
+
+    def clear(self):
+        data = self.words.cast("B")
+        data[:] = bytes(len(data))      # one copy, not a python loop over every word
+        self.age = 0
+
+    # look a position up, returns (move, score, depth, bound) or None
+    def probe(self, key):
+        self.probes += 1
+        words = self.words
+        index = (key & self.mask) * BUCKET_WORDS
+        for slot in (index, index + ENTRY_WORDS):
+            data = words[slot + 1]
+            if words[slot] ^ data == key:
+                self.hits += 1
+                move, score, depth, bound, age = unpack(data)
+                return move, score, depth, bound
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        words = self.words
+        index = (key & self.mask) * BUCKET_WORDS
+
+        # keep the old best move if the new result doesnt have one
+        data = words[index + 1]
+        old_depth = (data >> 32) & 0xFF
+        old_age = (data >> 42) & 63
+        same_key = words[index] ^ data == key
+        if not move and same_key:
+            move = data & 0xFFFF
+
+        # depth-preferred slot takes the entry when it is deeper, the same position or left over from an older search
+        if same_key or depth >= old_depth or old_age != self.age:
+            slot = index
+        else:
+            slot = index + ENTRY_WORDS
+            old = words[slot + 1]
+            if not move and words[slot] ^ old == key:
+                move = old & 0xFFFF
+
+        data = pack(move, max(-SCORE_OFFSET, min(SCORE_OFFSET - 1, score)), min(depth, 255), bound, self.age)
+        words[slot + 1] = data
+        words[slot] = key ^ data
+
+    # rough permille of the table filled by the current search, from a sample of the buckets
+    def hashfull(self):
+        sample = min(self.bucket_count, 500)
+        used = 0
+        for bucket in range(sample):
+            for slot in (bucket * BUCKET_WORDS, bucket * BUCKET_WORDS + ENTRY_WORDS):
+                data = self.words[slot + 1]
+                if data and (data >> 42) & 63 == self.age:
+                    used += 1
+        return used * 1000 // (sample * 2)
@@ -0,0 +1,20 @@
+import random
+from bitboard import SIDES
+
+# random 64 bit keys for zobrist hashing, a position's key is the xor of the keys of everything in it
+# the seed is fixed so every process and every file written with these keys agrees on them
+_rng = random.Random(20240601)
+
+PIECE_KEYS = {side: [[_rng.getrandbits(64) for _ in range(64)] for _ in range(6)] for side in SIDES}
+SIDE_KEY = _rng.getrandbits(64)     # xored in while black is to move
+EN_PASSANT_KEYS = [_rng.getrandbits(64) for _ in range(8)]      # one per column
+
+# one key per castling right, CASTLING_KEYS[rights] is the xor of the rights that are set
+_castling_right_keys = [_rng.getrandbits(64) for _ in range(4)]
+CASTLING_KEYS = []
+for _rights in range(16):
+    _key = 0
+    for _i in range(4):
+        if _rights & (1 << _i):
+            _key ^= _castling_right_keys[_i]
+    CASTLING_KEYS.append(_key)